@@ -0,0 +1,242 @@
+"""
+    Microbenchmark calls through `pyooc.ffi.Module.generic_function`
+    wrappers: plain, generic, generic-return and multi-return functions,
+    with the specialized wrappers against the old catch-all one (kept
+    here as `old_generic_function`), and generic calls with
+    `KindOfClass.class_` cached and uncached.
+
+    Usage: python benchmarks/bench_calls.py [CALLS]
+
+    Needs a C compiler (`cc`) to build a stub runtime for a real
+    `pyooc.ffi.Library`, see `stubruntime`; rock isn't needed.
+"""
+import os
+import sys
+import time
+import ctypes
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pyooc.ffi as ffi
+import stubruntime
+
+SOURCE = r'''
+int bench__plain(int a, int b) { return a + b; }
+int bench__generic(void *T, uint8_t *a) { return *(int *)a; }
+void bench__genret(void *ret, void *T, uint8_t *a) { *(int *)ret = *(int *)a; }
+void bench__multi(int *r0, int *r1, int a) { *r0 = a; *r1 = a + 1; }
+'''
+
+def old_generic_function(self, name, generictypes, restype, argtypes=(), method=False,
+                         additional_generictypes=()):
+    """
+        Create a wrapper for a generic function. That can also be used for non-generic
+        or generic multi-return functions. Didn't want too much code duplication, you know.
+    """
+    multi_return = isinstance(restype, tuple)
+    # `additional_generictypes` are generic typenames that don't get passed.
+    if argtypes is None:
+        argtypes = []
+    # is the return value a generic type? if yes, the
+    # ooc-generated function looks a bit different :)
+    if not multi_return:
+        return_generic = (restype in generictypes or restype in additional_generictypes)
+        multi_return_generic = False
+    else:
+        # For multi-return functions, this is always False.
+        return_generic = False
+        multi_return_generic = True
+    # get the method
+    func = self.new_function(name)
+    # now construct the argument list.
+    pass_argtypes = []
+    # if it's a method, the this pointer is the very first argument.
+    if method:
+        pass_argtypes.append(ctypes.c_void_p)
+    # if it's a multi-return function, now we get pointers to the return values.
+    if multi_return:
+        for rtype in restype:
+            if (rtype in generictypes or rtype in additional_generictypes):
+                pass_argtypes.append(ctypes.POINTER(ctypes.POINTER(self.library.types.Octet)))
+            else:
+                pass_argtypes.append(ctypes.POINTER(rtype))
+    # if the return value is a generic, the first argument will
+    # be a pointer to the return value
+    if return_generic:
+        pass_argtypes.append(ctypes.c_void_p)
+    # ooc's generic functions take the classes of the template
+    # types as first arguments. Say it's void* for simplicity.
+    for _ in generictypes:
+        pass_argtypes.append(ctypes.c_void_p)
+    # then all arguments follow
+    for argtype in argtypes:
+        # a templated argtype will be a pointer to a value.
+        if (argtype in generictypes or argtype in additional_generictypes):
+            pass_argtypes.append(ctypes.POINTER(self.library.types.Octet))
+        elif argtype == self.library.types.Class:
+            # special-case class to make ctypes accept `pyooc.ffi.Class`. TODO?
+            pass_argtypes.append(ffi.Class)
+        else:
+            pass_argtypes.append(argtype)
+    # yep, it's ready.
+    func.argtypes = pass_argtypes
+    # functions with generic return values don't have a return value in C,
+    # same for multi-return functions.
+    if not (return_generic or multi_return):
+        func.restype = restype
+    # Now, we'll construct a function. It's not very nice,
+    # I'd rather like to generate code, but that would
+    # be evil, I think. TODO: nicer nicer nicer!
+    def function(*args, **kwargs):
+        pass_args = []
+        # if it's a method, the first argument is
+        # the this pointer.
+        if method:
+            pass_args.append(args[0])
+            args = args[1:]
+        generictypes_types = {}
+        if multi_return:
+            multi_return_values = []
+            # Multiple, partly generic return types.
+            for ridx, rtype in enumerate(restype):
+                if (rtype in generictypes or rtype in additional_generictypes):
+                    # Generic, yes.
+                    if (method and rtype in additional_generictypes):
+                        # See above.
+                        restype_ = getattr(pass_args[0].contents, rtype)
+                        result = self.library._get_class_type(restype_)()
+                    else:
+                        restype_ = kwargs.pop('restype%d' % ridx)
+                        assert restype_ # TODO: COOL error
+                        result = restype_()
+                        if rtype not in generictypes_types:
+                            generictypes_types[rtype] = restype_.class_()
+                    pass_args.append(ctypes.cast(
+                        ctypes.pointer(ctypes.pointer(result)),
+                        ctypes.POINTER(ctypes.POINTER(self.library.types.Octet))
+                        ))
+                else:
+                    # Ordinary.
+                    result = rtype()
+                    pass_args.append(ctypes.pointer(result))
+                multi_return_values.append(result)
+            assert not kwargs
+        # if the return value is generic or, the user has to pass the type explicitly.
+        if return_generic:
+            restype_ = None
+            if (method and restype in additional_generictypes):
+                # Yay generic type restype AND a method AND class-wide
+                # generic type. TODO: BAH EVILNESS
+                restype_ = getattr(pass_args[0].contents, restype)
+                # allocate some memory for dinner
+                result = self.library._get_class_type(restype_)()
+            else:
+                restype_ = kwargs.pop('restype')
+                assert not kwargs
+                assert restype_ # TODO: nice error
+                result = restype_()
+                # TODO: Since we have to pass the result type anyway, we could work around
+                # the rock limitation that you have to pass the class explicitly if you have
+                # a function with a generic return value (ie. `a: func <T> (T: Class) -> T`). Hmmm?
+            pass_args.append(ctypes.pointer(result))
+        regular_args = []
+        for argtype, arg in zip(argtypes, args):
+            # is it generic?
+            arg = self.convert_to_ctypes(arg)
+            if (argtype in generictypes or argtype in additional_generictypes):
+                # yes. pass a pointer.
+                regular_args.append(
+                        ctypes.cast(
+                            ctypes.pointer(arg),
+                            ctypes.POINTER(
+                                self.library.types.Octet
+                                )
+                            ))
+                if argtype not in generictypes_types:
+                    generictypes_types[argtype] = arg.class_()
+            else:
+                # no. just pass the argument.
+                regular_args.append(arg)
+        for gtype in generictypes:
+            pass_args.append(generictypes_types[gtype])
+        pass_args.extend(regular_args)
+        # and now ... call it!
+        if return_generic:
+            func(*pass_args)
+            return result
+        elif multi_return:
+            func(*pass_args)
+            return tuple(multi_return_values)
+        else:
+            return func(*pass_args)
+    return function
+
+def wrappers(module, generic_function):
+    Int = module.library.types.Int
+    return [
+        ('plain', generic_function(module, 'plain', (), Int, [Int, Int]),
+         (1, 2), {}),
+        ('generic', generic_function(module, 'generic', ['T'], Int, ['T']),
+         (Int(3),), {}),
+        ('generic return', generic_function(module, 'genret', ['T'], 'T', ['T']),
+         (Int(4),), {'restype': Int}),
+        ('multi-return', generic_function(module, 'multi', (), (Int, Int), [Int]),
+         (5,), {}),
+    ]
+
+def class_wrappers(module):
+    Int = module.library.types.Int
+    # `Int` without the class pointer cache.
+    UncachedInt = type('UncachedInt', (Int,), {
+        'class_': classmethod(lambda cls: cls._load_class()),
+    })
+    func = module.generic_function('generic', ['T'], Int, ['T'])
+    return [
+        ('generic', func, UncachedInt(3), Int(3)),
+    ]
+
+def value(result):
+    if isinstance(result, tuple):
+        return tuple(map(value, result))
+    return getattr(result, 'value', result)
+
+def rate(func, args, kwargs, calls, repeat=3):
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        for _ in xrange(calls):
+            func(*args, **kwargs)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return calls / best
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    tmpdir = tempfile.mkdtemp('.bench')
+    try:
+        library = ffi.Library(stubruntime.build(tmpdir, 'bench',
+                                                stubruntime.source(['bench'], SOURCE)))
+    finally:
+        shutil.rmtree(tmpdir)
+    module = library.get_module('bench')
+    old = wrappers(module, old_generic_function)
+    new = wrappers(module, ffi.Module.generic_function)
+    print '%-16s %14s %14s' % ('', 'old calls/s', 'new calls/s')
+    for (name, old_func, args, kwargs), (_, new_func, _, _) in zip(old, new):
+        assert value(old_func(*args, **dict(kwargs))) == value(new_func(*args, **dict(kwargs)))
+        old_rate = rate(old_func, args, kwargs, calls)
+        new_rate = rate(new_func, args, kwargs, calls)
+        print '%-16s %14d %14d (%.1fx)' % (name, old_rate, new_rate, new_rate / old_rate)
+    print
+    print '%-16s %14s %14s' % ('class_', 'uncached', 'cached')
+    for name, func, old_arg, new_arg in class_wrappers(module):
+        assert value(func(old_arg)) == value(func(new_arg))
+        old_rate = rate(func, (old_arg,), {}, calls)
+        new_rate = rate(func, (new_arg,), {}, calls)
+        print '%-16s %14d %14d (%.1fx)' % (name, old_rate, new_rate, new_rate / old_rate)
+
+if __name__ == '__main__':
+    main()
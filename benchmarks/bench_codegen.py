@@ -0,0 +1,54 @@
+"""
+    Compare the startup time of `bind_module` with binding the same
+    module through code generated by `pyooc.bind.codegen`.
+
+    Usage: python benchmarks/bench_codegen.py [LIBRARY REPOSITORY MODULE]
+
+    The defaults are the ones of the Makefile: ./libtest.so, repo, test.
+"""
+import os
+import sys
+import imp
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyooc.ffi import Library
+from pyooc.parser import Repository
+from pyooc.bind import bind_module
+from pyooc.bind.codegen import write_module
+
+def main():
+    if len(sys.argv) > 3:
+        lib_filename, repo_path, path = sys.argv[1:4]
+    else:
+        lib_filename, repo_path, path = './libtest.so', 'repo', 'test'
+    tmpdir = tempfile.mkdtemp()
+    try:
+        generated = os.path.join(tmpdir, 'binding.py')
+        write_module(Repository(repo_path, cache=True), path, generated)
+
+        start = time.time()
+        lib = Library(lib_filename)
+        bind_module(lib, Repository(repo_path, cache=False), path)
+        dynamic = time.time() - start
+        print 'bind_module:      %.4fs' % dynamic
+
+        start = time.time()
+        lib = Library(lib_filename)
+        bind_module(lib, Repository(repo_path, cache=True), path)
+        cached = time.time() - start
+        print 'bind_module (module cache): %.4fs (%.1fx)' % (cached, dynamic / cached)
+
+        start = time.time()
+        lib = Library(lib_filename)
+        imp.load_source('binding', generated).bind(lib)
+        aot = time.time() - start
+        print 'generated module: %.4fs (%.1fx)' % (aot, dynamic / aot)
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
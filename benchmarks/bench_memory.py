@@ -0,0 +1,102 @@
+"""
+    Report the memory used per parser entity, with the slot-based layout
+    and with an equivalent `__dict__`-based object.
+
+    Usage: python benchmarks/bench_memory.py [REPOSITORY]
+
+    Without a repository argument, a synthetic one is generated.
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pyooc.parser as parser
+import repogen
+
+CLASSES = (
+    parser.Function,
+    parser.Method,
+    parser.Field,
+    parser.GlobalVariable,
+    parser.EnumElement,
+    parser.Argument,
+    parser.PropertyData,
+)
+
+class DictObject(object):
+    pass
+
+def all_slots(cls):
+    slots = []
+    for klass in cls.__mro__:
+        slots.extend(getattr(klass, '__slots__', ()))
+    return slots
+
+def size_of(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def as_dict_object(obj):
+    """
+        Return a `__dict__`-based object with the same attributes as *obj*.
+    """
+    copy = DictObject()
+    for name in all_slots(type(obj)):
+        if hasattr(obj, name):
+            setattr(copy, name, getattr(obj, name))
+    return copy
+
+def collect(repo):
+    entities = dict((cls, []) for cls in CLASSES)
+    def add(obj):
+        if type(obj) in entities:
+            entities[type(obj)].append(obj)
+    for module in repo.get_all_modules().itervalues():
+        for member in module.members.itervalues():
+            children = []
+            if hasattr(member, 'members'):
+                children = member.members.values()
+            elif isinstance(member, parser.Enum):
+                children = member.elements.values()
+            for child in [member] + children:
+                add(child)
+                if isinstance(child, parser.Function):
+                    for arg in child.arguments:
+                        add(arg)
+                if getattr(child, 'property_data', None) is not None:
+                    add(child.property_data)
+    return entities
+
+def main():
+    tmpdir = None
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        tmpdir = path = tempfile.mkdtemp('.repo')
+        repogen.generate(path, modules=50)
+    try:
+        entities = collect(parser.Repository(path, cache=False))
+        print '%-16s %8s %12s %12s' % ('entity', 'count', '__dict__', '__slots__')
+        total_before = total_after = 0
+        for cls in CLASSES:
+            objs = entities[cls]
+            if not objs:
+                continue
+            before = sum(size_of(as_dict_object(obj)) for obj in objs)
+            after = sum(size_of(obj) for obj in objs)
+            total_before += before
+            total_after += after
+            print '%-16s %8d %10.1f B %10.1f B' % (
+                cls.__name__, len(objs), float(before) / len(objs), float(after) / len(objs))
+        print 'total: %d KiB -> %d KiB' % (total_before // 1024, total_after // 1024)
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
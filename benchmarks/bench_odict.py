@@ -0,0 +1,106 @@
+"""
+    Microbenchmarks for `pyooc.parser.odict.odict`, compared to the
+    `DictMixin` recipe it replaced.
+
+    Usage: python benchmarks/bench_odict.py [MAPPINGS] [KEYS]
+
+    The defaults (5000 mappings of 40 keys) are roughly what the members
+    of all classes of the ooc SDK amount to.
+"""
+import os
+import sys
+import time
+from UserDict import DictMixin
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyooc.parser.odict import odict
+
+class recipe_odict(DictMixin):
+    """
+        The recipe from http://code.activestate.com/recipes/496761/
+    """
+    def __init__(self, init=None):
+        self._keys = []
+        self._data = {}
+        if init is not None:
+            for key, value in init:
+                self[key] = value
+
+    def __setitem__(self, key, value):
+        if key not in self._data:
+            self._keys.append(key)
+        self._data[key] = value
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._keys.remove(key)
+
+    def keys(self):
+        return list(self._keys)
+
+def bench(cls, mappings, keys):
+    names = ['member%d' % i for i in xrange(keys)]
+    items = [(name, name) for name in names]
+    dicts = []
+
+    def insert():
+        del dicts[:]
+        for _ in xrange(mappings):
+            d = cls()
+            for name in names:
+                d[name] = name
+            dicts.append(d)
+
+    def construct():
+        del dicts[:]
+        for _ in xrange(mappings):
+            dicts.append(cls(items))
+
+    def iterate():
+        for d in dicts:
+            for name, value in d.iteritems():
+                pass
+
+    def lookup():
+        for d in dicts:
+            for name in names:
+                name in d
+                d[name]
+
+    def delete():
+        for d in dicts:
+            for name in names[::2]:
+                del d[name]
+
+    def timed(func, setup=None):
+        best = None
+        for _ in xrange(3):
+            if setup is not None:
+                setup()
+            start = time.time()
+            func()
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    return [timed(insert), timed(construct), timed(iterate), timed(lookup),
+            timed(delete, insert)]
+
+def main():
+    mappings = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    keys = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    print '%d mappings of %d keys' % (mappings, keys)
+    old = bench(recipe_odict, mappings, keys)
+    new = bench(odict, mappings, keys)
+    print '%-10s %10s %10s %8s' % ('', 'recipe', 'odict', 'speedup')
+    for name, before, after in zip(('insert', 'construct', 'iterate', 'lookup', 'delete'),
+                                    old, new):
+        print '%-10s %9.3fs %9.3fs %7.1fx' % (name, before, after, before / after)
+
+if __name__ == '__main__':
+    main()
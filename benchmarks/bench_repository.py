@@ -0,0 +1,58 @@
+"""
+    Compare loading a whole repository without the module cache, with a
+    cold cache (which is filled on the way) and with a warm one, reading
+    modules eagerly and lazily.
+
+    Usage: python benchmarks/bench_repository.py [REPOSITORY]
+
+    Without a repository argument, a synthetic one is generated.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyooc.parser import Repository
+import repogen
+
+def load_all(path, cache, cache_dir, lazy, cold=False, repeat=3):
+    best = None
+    for _ in xrange(repeat):
+        if cold and os.path.isdir(cache_dir):
+            shutil.rmtree(cache_dir)
+        repo = Repository(path, cache=cache, cache_dir=cache_dir, lazy=lazy)
+        start = time.time()
+        modules = repo.get_all_modules()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, len(modules)
+
+def main():
+    tmpdir = None
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        tmpdir = path = tempfile.mkdtemp('.repo')
+        repogen.generate(path, modules=200)
+    cache_dir = tempfile.mkdtemp('.cache')
+    try:
+        for lazy in (False, True):
+            print 'lazy' if lazy else 'eager'
+            plain, count = load_all(path, False, cache_dir, lazy)
+            print '  no cache:    %d modules in %.3fs' % (count, plain)
+            cold, count = load_all(path, True, cache_dir, lazy, cold=True)
+            print '  cold cache:  %d modules in %.3fs (%.2fx)' % (count, cold, plain / cold)
+            warm, count = load_all(path, True, cache_dir, lazy)
+            print '  warm cache:  %d modules in %.3fs (%.2fx)' % (count, warm, plain / warm)
+    finally:
+        if os.path.isdir(cache_dir):
+            shutil.rmtree(cache_dir)
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+    Benchmark `Module.resolve_type` on a deep import graph, compared to
+    the old recursive search through the global imports.
+
+    Usage: python benchmarks/bench_resolve.py [MODULES]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyooc.parser import Repository
+import repogen
+
+def recursive_resolve_type(module, tag, seen=None):
+    """
+        The search `Module.resolve_type` used to do.
+    """
+    if seen is None:
+        seen = set()
+    if tag in module.members:
+        return module.members[tag]
+    for global_import in module.global_imports:
+        imported_module = module.parent.get_module(global_import)
+        if imported_module not in seen:
+            seen.add(imported_module)
+            try:
+                return recursive_resolve_type(imported_module, tag, seen)
+            except ValueError:
+                continue
+    raise ValueError(tag)
+
+def run(modules, resolve):
+    """
+        Walk the `extends` chain of every class in every module, which is
+        what `Classlike.ancestors` and `Method.overrides` do, and look up
+        a type that doesn't exist.
+    """
+    start = time.time()
+    for module in modules:
+        for member in module.members.itervalues():
+            extends = getattr(member, 'extends', None)
+            while extends and extends != 'Object':
+                extends = resolve(module, extends).extends
+        try:
+            resolve(module, 'DoesNotExist')
+        except ValueError:
+            pass
+    return time.time() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    path = tempfile.mkdtemp('.repo')
+    try:
+        paths = repogen.generate(path, modules=count, classes=5, methods=2, depth=3)
+        repo = Repository(path, cache=False)
+        modules = [repo.get_module(p) for p in paths]
+        old = run(modules, recursive_resolve_type)
+        print 'recursive search: %.3fs' % old
+        new = run(modules, lambda module, tag: module.resolve_type(tag))
+        print 'symbol table (cold): %.3fs (%.1fx)' % (new, old / new)
+        new = run(modules, lambda module, tag: module.resolve_type(tag))
+        print 'symbol table (warm): %.3fs (%.1fx)' % (new, old / new)
+    finally:
+        shutil.rmtree(path)
+
+if __name__ == '__main__':
+    main()
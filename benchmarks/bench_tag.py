@@ -0,0 +1,84 @@
+"""
+    Benchmark tag parsing over all tags found in a repository: the old
+    `lex`/`parse` generator pipeline against `parse_string` with a cold
+    and a warm cache.
+
+    Usage: python benchmarks/bench_tag.py [REPOSITORY]
+
+    Without a repository argument, a synthetic one is generated.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from pyooc.parser import tag
+import repogen
+
+#: Keys of entity dictionaries that hold tags.
+TAG_KEYS = ('returnType', 'varType', 'extends', 'from')
+
+def collect_tags(data, tags):
+    if isinstance(data, dict):
+        for key, value in data.iteritems():
+            if key in TAG_KEYS and isinstance(value, basestring):
+                tags.append(value)
+            elif key == 'arguments':
+                tags.extend(arg[1] for arg in value)
+            else:
+                collect_tags(value, tags)
+    elif isinstance(data, list):
+        for value in data:
+            collect_tags(value, tags)
+
+def all_tags(path):
+    tags = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            if filename.endswith('.json'):
+                with open(os.path.join(dirpath, filename)) as f:
+                    collect_tags(json.load(f), tags)
+    return tags
+
+def timed(func, tags, repeat=3):
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        for s in tags:
+            func(s)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():
+    tmpdir = None
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        tmpdir = path = tempfile.mkdtemp('.repo')
+        repogen.generate(path, modules=100)
+    try:
+        tags = all_tags(path)
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir)
+    print '%d tags, %d distinct' % (len(tags), len(set(tags)))
+    old = timed(lambda s: tag.parse(tag.lex(iter(s).next)), tags)
+    print 'lex/parse:          %.3fs' % old
+    cold = timed(lambda s: tag._parse_tokens(tag.tokenize(s), 0), tags)
+    print 'tokenize (no cache): %.3fs (%.1fx)' % (cold, old / cold)
+    tag.clear_cache()
+    warm = timed(tag.parse_string, tags)
+    print 'parse_string:       %.3fs (%.1fx)' % (warm, old / warm)
+
+if __name__ == '__main__':
+    main()
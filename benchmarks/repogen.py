@@ -0,0 +1,110 @@
+"""
+    Generate synthetic JSON repositories that look like the output of
+    `rock -backend=json`, for benchmarking `pyooc.parser` and `pyooc.bind`
+    without a compiler.
+"""
+import os
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+def function(name, type='function', arguments=(), return_type=None,
+             generic_types=(), modifiers=()):
+    return {
+        'type': type,
+        'name': name,
+        'tag': name,
+        'modifiers': list(modifiers),
+        'genericTypes': list(generic_types),
+        'extern': None,
+        'returnType': return_type,
+        'doc': '',
+        'arguments': [[argname, tag, None] for argname, tag in arguments],
+    }
+
+def variable(name, var_type, type='globalVariable', modifiers=()):
+    return {
+        'type': type,
+        'name': name,
+        'modifiers': list(modifiers),
+        'value': None,
+        'varType': var_type,
+        'extern': None,
+        'propertyData': None,
+    }
+
+def class_(name, extends, members):
+    return {
+        'type': 'class',
+        'name': name,
+        'tag': name,
+        'fullName': name,
+        'genericTypes': [],
+        'extends': extends,
+        'abstract': False,
+        'doc': '',
+        'members': [[member['name'], member] for member in members],
+    }
+
+def module_path(index):
+    return 'pkg/mod%d' % index
+
+def class_name(module_index, class_index):
+    return 'C%d_%d' % (module_index, class_index)
+
+def generate(root, modules=100, classes=10, methods=10, depth=1):
+    """
+        Write *modules* module descriptions to *root*. Every module imports
+        the *depth* modules before it, and declares *classes* classes with
+        *methods* methods each. The first class of each module extends the
+        last class of the previous module, the others extend their
+        predecessor, so class hierarchies get deep.
+    """
+    package_dir = os.path.join(root, 'sdk', 'pkg')
+    if not os.path.isdir(package_dir):
+        os.makedirs(package_dir)
+    lang_dir = os.path.join(root, 'sdk', 'lang')
+    if not os.path.isdir(lang_dir):
+        os.makedirs(lang_dir)
+    with open(os.path.join(lang_dir, 'types.json'), 'w') as f:
+        json.dump({
+            'path': 'lang/types',
+            'globalImports': [],
+            'namespacedImports': {},
+            'uses': [],
+            'entities': [['Object', class_('Object', None, [])]],
+        }, f)
+    for index in xrange(modules):
+        entities = []
+        for cindex in xrange(classes):
+            name = class_name(index, cindex)
+            if cindex:
+                extends = class_name(index, cindex - 1)
+            elif index:
+                extends = class_name(index - 1, classes - 1)
+            else:
+                extends = 'Object'
+            members = [function('method%d' % mindex, 'method',
+                                [('a', 'Int'), ('b', 'pointer(Char)'), ('c', name)],
+                                'Int')
+                       for mindex in xrange(methods)]
+            members.append(function('new', 'method', [('a', 'Int')], name, modifiers=['static']))
+            members.append(variable('field%d' % cindex, 'Int', 'field'))
+            members.append(variable('other', class_name(index, 0), 'field'))
+            entities.append([name, class_(name, extends, members)])
+        entities.append(['run', function('run', arguments=[('c', class_name(index, 0))],
+                                         return_type='Int')])
+        entities.append(['counter', variable('counter', 'Int')])
+        data = {
+            'path': module_path(index),
+            'globalImports': ([module_path(i) for i in xrange(max(0, index - depth), index)]
+                              + ['lang/types']),
+            'namespacedImports': {},
+            'uses': [],
+            'entities': entities,
+        }
+        with open(os.path.join(package_dir, 'mod%d.json' % index), 'w') as f:
+            json.dump(data, f)
+    return [module_path(index) for index in xrange(modules)]
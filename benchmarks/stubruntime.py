@@ -0,0 +1,59 @@
+"""
+    Build stub shared libraries that have just enough of the ooc runtime
+    for `pyooc.ffi.Library` to set up its `pyooc.ffi.types.Types`: the
+    load functions of the `lang/*` modules and a class function for each
+    type, without rock. Needs a C compiler (`cc`).
+"""
+import os
+import subprocess
+
+from pyooc.ffi.types import TYPE_NAMES
+
+MODULES = ['lang/types', 'lang/Numbers', 'lang/String',
+           'lang/Character', 'lang/Buffer', 'lang/Iterators']
+
+HEADER = r'''
+#include <stddef.h>
+#include <stdint.h>
+
+struct stub_class {
+    void *class_;
+    size_t instanceSize;
+    size_t size;
+    void *name;
+    void *super;
+};
+'''
+
+def source(modules=(), extra=''):
+    """
+        Return the C source of a stub runtime. The modules *modules*
+        (ooc module paths) get load functions, too; *extra* is appended.
+    """
+    lines = [HEADER]
+    for path in MODULES:
+        prefix = path.replace('/', '_')
+        lines.append('void %s_load(void) {}' % prefix)
+        for name in sorted(TYPE_NAMES):
+            # only struct covers are checked, `Closure` is the only one.
+            size = '2 * sizeof(void *)' if name == 'Closure' else 'sizeof(void *)'
+            lines.append('static struct stub_class %s__%s_c = {0, %s, %s, 0, 0};'
+                         % (prefix, name, size, size))
+            lines.append('void *%s__%s_class(void) { return &%s__%s_c; }'
+                         % (prefix, name, prefix, name))
+    for path in modules:
+        lines.append('void %s_load(void) {}' % path.replace('/', '_'))
+    lines.append(extra)
+    return '\n'.join(lines) + '\n'
+
+def build(directory, name, sourcecode):
+    """
+        Compile *sourcecode* to ``lib<name>.so`` in *directory* and
+        return its filename.
+    """
+    source_filename = os.path.join(directory, name + '.c')
+    lib_filename = os.path.join(directory, 'lib%s.so' % name)
+    with open(source_filename, 'w') as f:
+        f.write(sourcecode)
+    subprocess.check_call(['cc', '-shared', '-fPIC', '-o', lib_filename, source_filename])
+    return lib_filename
@@ -1,8 +1,9 @@
 import ctypes
+import time
 
-import pyooc.ffi as ffi
-import pyooc.parser as parser
-from pyooc.parser.tag import parse_string as parse_tag
+from pyooc import timing
+from pyooc.parser.odict import odict
+from pyooc.parser.tag import translate as translate_tag
 
 class SorryError(NotImplementedError):
     pass
@@ -43,219 +44,219 @@ C_TYPES_MAP = {
 }
 
 def resolve_c_type(library, repo, parser_module, typename):
-    if typename in C_TYPES_MAP:
-        return C_TYPES_MAP[typename]
-    elif typename.endswith('*'):
-        typ = resolve_c_type(library, repo, parser_module, typename[:-1])
-        return ctypes.POINTER(typ)
-    else:
-        # maybe it's a ooc type.
-        try:
-            return resolve_type(library, repo, parser_module, typename)
-        except SorryError:
-            print 'Unknown type: %r' % typename
-            return ctypes.c_void_p
+    """
+        Return the ctypes type of the C type name *typename* in *parser_module*,
+        see `pyooc.bind.plan.c_typeref`.
+    """
+    return plan.get_type(library, plan.c_typeref(repo, parser_module, typename))
+
+def func_signature(args):
+    """
+        Return the argument tags and the return tag (or None) of a
+        ``Func(multi(arg, ...), return)`` tag, given the parsed arguments
+        *args*. Return None if it's no such tag.
+    """
+    if (not args or len(args) > 2
+            or not isinstance(args[0], tuple) or args[0][0] != 'multi'):
+        return None
+    arguments = [translate_tag(arg) for arg in args[0][1]]
+    if len(args) == 1 or args[1] in ('Void', 'void'):
+        return (arguments, None)
+    return (arguments, translate_tag(args[1]))
 
 def resolve_type(library, repo, parser_module, tag):
-    if '(' in tag:
-        # has modifiers.
-        mod, args = parse_tag(tag)
-        if mod in ('pointer', 'reference'):
-            # pointer and reference have the same handling
-            return ctypes.POINTER(resolve_type(library, repo, parser_module, args[0]))
-        elif mod == 'Func':
-            return library.types.Closure # TODO: specialized funcs!
-        else:
-            raise SorryError('Unknown tag: %r' % tag)
-    else:
-        # just a name.
-        module = library.get_module(parser_module.path)
-        # search in current module
-        if hasattr(module, tag):
-            # yay!
-            return getattr(module, tag)
-        else:
-            # nay.
-            # types? Since lang/* modules are imported automatically anyway,
-            # it's no problem to look through them before looking through
-            # explicitly imported modules. Right? (TODO)
-            # The other way round, it will cause problems because we'd have
-            # `String` defined multiple times. TODO anyway.
-            if hasattr(library.types, tag):
-                return getattr(library.types, tag)
-            # TODO: namespaced imports
-            for import_path in parser_module.global_imports:
-                if hasattr(library.get_module(import_path), tag):
-                    return getattr(library.get_module(import_path), tag)
-            raise SorryError('Unknown type: %r' % tag)
+    """
+        Return the type *tag* stands for in *parser_module*, see
+        `pyooc.bind.plan.typeref`. The results are cached by the library,
+        see `pyooc.ffi.Library.invalidate_type_cache`.
+    """
+    return plan.get_type(library, plan.typeref(repo, parser_module, tag))
 
 def analyze_function(library, repo, parser_module, cls_entity, entity):
-    # arguments.
-    arguments = []
-    for arg in entity.arguments:
-        if (arg.tag in entity.generic_types or (cls_entity and arg.tag in cls_entity.generic_types)):
-            # generic.
-            arguments.append(arg.tag)
-        else:
-            arguments.append(resolve_type(library, repo, parser_module, arg.tag))
-    # return type.
-    if entity.return_type is None:
-        return_type = None
-    elif entity.return_type.startswith('multi('):
-        # multi-return ...
-        return_type = []
-        for rtype in parse_tag(entity.return_type)[1]:
-            if (rtype in entity.generic_types or (cls_entity and rtype in cls_entity.generic_types)):
-                return_type.append(rtype)
-            else:
-                return_type.append(resolve_type(library, repo, parser_module, rtype))
-        return_type = tuple(return_type)
-    elif (entity.return_type in entity.generic_types or (cls_entity and entity.return_type in cls_entity.generic_types)):
-        return_type = entity.return_type
-    else:
-        return_type = resolve_type(library, repo, parser_module, entity.return_type)
-    # modifiers.
-    # well, i think only `static` has any effect here. right?
-    static = 'static' in entity.modifiers
-    return {
-        'name': entity.name,
-        'arguments': arguments,
-        'generic_types': entity.generic_types,
-        'return_type': return_type,
-        'generic_return_type': isinstance(return_type, basestring),
-        'static': static,
-    }
+    """
+        Like `pyooc.bind.plan.analyze_function`, with the types resolved.
+    """
+    analyzed = plan.analyze_function(repo, parser_module, cls_entity, entity)
+    analyzed['arguments'] = [plan.get_type(library, ref) for ref in analyzed['arguments']]
+    analyzed['return_type'] = plan.get_type(library, analyzed['return_type'])
+    return analyzed
+
+def ensure_bound(typ):
+    """
+        If *typ* is a class or cover waiting to be bound lazily, bind it now.
+    """
+    binder = getattr(typ, '__dict__', {}).get('_binder_')
+    if binder is not None:
+        binder()
 
 def bind_function(library, repo, parser_module, entity):
+    """
+        Bind the function *entity*, see `pyooc.bind.plan.apply_function`.
+    """
     module = library.get_module(parser_module.path)
-    analyzed = analyze_function(library, repo, parser_module, None, entity)
-    if (analyzed['generic_types'] or isinstance(analyzed['return_type'], tuple)):
-        # Is generic or is multi-value return. Use `generic_function`.
-        wrapper = module.generic_function(
-            analyzed['name'],
-            analyzed['generic_types'],
-            analyzed['return_type'],
-            analyzed['arguments'],
-        )
-    else:
-        # Anything else - just a normal function.
-        wrapper = module[analyzed['name']]
-        wrapper.restype = analyzed['return_type']
-        wrapper.argtypes = analyzed['arguments']
-    setattr(module, analyzed['name'], wrapper)
+    plan.apply_function(library, module, plan.analyze_function(repo, parser_module, None, entity))
 
 def bind_global_variable(library, repo, parser_module, entity):
+    """
+        Bind the global variable *entity*, see `pyooc.bind.plan.apply_global_variable`.
+    """
     module = library.get_module(parser_module.path)
-    var_type = resolve_type(library, repo, parser_module, entity.type)
-    setattr(module, entity.name, module.global_variable(entity.name, var_type))
+    plan.apply_global_variable(library, module, entity.name,
+                               plan.typeref(repo, parser_module, entity.type))
 
 def bind_class(library, repo, parser_module, entity):
     """
-        Works for classes and covers!
-    """
-    funcs = []
-    fields = []
-    static_fields = []
-    for name, member in entity.members.iteritems():
-        if isinstance(member, parser.Method):
-            # Yay method! bind it ...
-            analyzed = analyze_function(library, repo, parser_module, entity, member)
-            if (analyzed['generic_types'] or analyzed['generic_return_type']):
-                funcs.append(ffi.Func(name,
-                    generictypes=analyzed['generic_types'],
-                    restype=analyzed['return_type'],
-                    argtypes=analyzed['arguments'],
-                    overrides=member.overrides,
-                    static=analyzed['static']))
-            else:
-                funcs.append(ffi.Func(name,
-                restype=analyzed['return_type'],
-                argtypes=analyzed['arguments'],
-                static=analyzed['static'],
-                overrides=member.overrides))
-        elif isinstance(member, parser.Field):
-            if member.type in entity.generic_types:
-                var_type = member.type
-            else:
-                var_type = resolve_type(library, repo, parser_module, member.type)
-            if member.name in entity.generic_types:
-                # skip the T/U/V... members, they're added in _setup
-                continue
-            # Is it a property?
-            if member.property_data is not None:
-                field = (member.name,
-                         var_type,
-                         member.property_data.full_getter_name,
-                         member.property_data.full_setter_name)
-            else:
-                field = (member.name, var_type)
-            if 'static' in member.modifiers:
-                static_fields.append(field)
-            else:
-                fields.append(field)
-        else:
-            print 'ignored', member
-    super_class = resolve_type(library, repo, parser_module, entity.extends)
-    # Finally, create the class.
-    dct = {
-        '_name_': entity.name,
-        '_fields_': fields,
-        '_static_fields_': static_fields,
-        '_methods_': funcs,
-        '_extends_': super_class,
-        '_generictypes_': getattr(entity, 'generic_types', None), # isn't needed in Class/Cover, but we do it anyway.
-    }
+        Works for classes and covers! See `pyooc.bind.plan.apply_class`.
+    """
     module = library.get_module(parser_module.path)
-    cls = getattr(module, entity.name)
-    for n, i in dct.iteritems():
-        setattr(cls, n, i)
-    cls.bind(module)
+    plan.apply_class(library, module, plan.analyze_class(repo, parser_module, entity))
+
+def _declare(library, module, name, kind, from_=None, layout=None):
+    cls = plan.declare_type(library, module, name, kind, from_)
+    if cls is None:
+        return None
+    if library._type_cache:
+        # Type references that were looked up before might mean the new type now.
+        library.invalidate_type_cache(names=[name])
+    if layout is not None:
+        plan.lay_out_cover(library, cls, layout)
+    return cls
 
 def bind_class_minimal(library, repo, parser_module, entity):
-    cls = type(str(entity.name), (ffi.Class,), {})
-    setattr(library.get_module(parser_module.path), entity.name, cls)
+    """
+        Declare the class *entity* and return it, or None if its module
+        has a type of that name already. See `pyooc.bind.plan.declare_type`.
+    """
+    return _declare(library, library.get_module(parser_module.path), entity.name, 'class')
 
 def bind_cover_minimal(library, repo, parser_module, entity):
+    """
+        Declare the cover *entity* and return it, or None if its module
+        has a type of that name already. Struct covers are laid out, too.
+        See `pyooc.bind.plan.declare_type`.
+    """
+    module = library.get_module(parser_module.path)
     if entity.from_:
-        fromtype = resolve_c_type(library, repo, parser_module, entity.from_)
-        cls = type(str(entity.name), (fromtype, ffi.Cover), {})
-    else:
-        cls = type(str(entity.name), (ffi.Cover, ctypes.Structure), {}) # TODO?
-    setattr(library.get_module(parser_module.path), entity.name, cls)
+        return _declare(library, module, entity.name, 'cover',
+                        plan.c_typeref(repo, parser_module, entity.from_))
+    return _declare(library, module, entity.name, 'cover',
+                    layout=plan.analyze_layout(repo, parser_module, entity))
 
-def bind_module(library, repo, path):
+def bind_module(library, repo, path, lazy=False):
     """
         Return a :class:`pyooc.ffi.Module`.
+
+        The module is analyzed (see `pyooc.bind.plan.analyze_module`),
+        the types of the modules it imports (directly or not) and its own
+        types are declared, then the plan is applied.
+
+        If *lazy* is true, the members are not bound now, but the first
+        time they're accessed (see `pyooc.ffi.Module.add_lazy_member`).
+        Classes needed by them are bound on the way.
     """
     if path == 'lang/types':
         return
-    # Do all deps minimally
-    entity = repo.get_module(path)
-    for import_path in entity.global_imports:
-        bind_module_minimal(library, repo, import_path)
-    # Do myself minimally.
-    bind_module_minimal(library, repo, path)
-    # Now do the real stuff.
-    module = library.get_module(path)
-    for name, member in entity.members.iteritems():
-        if isinstance(member, (parser.Class, parser.Cover)):
-            bind_class(library, repo, entity, member)
-        elif isinstance(member, parser.Function):
-            bind_function(library, repo, entity, member)
-        elif (isinstance(member, parser.GlobalVariable) and
-              not member.name.startswith('__')): # ignore string literals
-                bind_global_variable(library, repo, entity, member)
-        else:
-            print 'Ignoring member: %s (%r)' % (name, member)
+    with timing.module(path):
+        module = library.get_module(path)
+        if path in library._bound_modules:
+            return module
+        # Do all deps and myself minimally. Struct covers are laid out when
+        # they're declared, so the modules they use come first.
+        for dep_path in dependency_order(repo, [path]):
+            bind_module_minimal(library, repo, dep_path)
+        # Now do the real stuff.
+        return plan.apply_module(library, plan.analyze_module(repo, path), lazy)
 
 def bind_module_minimal(library, repo, path):
-    if path == 'lang/types':
+    """
+        Declare the types of the module *path*, see `pyooc.bind.plan.declare_module`.
+    """
+    if path == 'lang/types' or path in library._declared_modules:
         return
-    entity = repo.get_module(path)
-    module = library.get_module(path)
-    for name, member in entity.members.iteritems():
-        if isinstance(member, parser.Class):
-            bind_class_minimal(library, repo, entity, member)
-        elif isinstance(member, parser.Cover):
-            bind_cover_minimal(library, repo, entity, member)
+    plan.declare_module(library, plan.analyze_declarations(repo, path))
+
+def watch_repository(library, repo, lazy=False):
+    """
+        Whenever *repo* reloads modules (see `pyooc.parser.Repository.refresh`),
+        drop the cached type resolutions of *library* that might be outdated
+        and declare the changed modules and the modules importing them
+        again. The ones of them that were bound are bound again (see
+        `bind_module`; *lazy* is passed on), the others are declared the
+        next time they're needed. Classes of them that are still referenced
+        elsewhere are stale afterwards.
+    """
+    def listener(changed, affected):
+        library.invalidate_type_cache(paths=affected)
+        # The modules importing the changed ones refer to their old
+        # classes, so all of them start over.
+        stale = [path for path in affected if path in library._declared_modules]
+        rebind = set(path for path in stale if path in library._bound_modules)
+        for path in stale:
+            library.get_module(path).reset()
+            library._declared_modules.discard(path)
+            library._bound_modules.discard(path)
+        # removed modules are just forgotten.
+        rebind.intersection_update(repo.get_all_paths())
+        for path in dependency_order(repo, sorted(rebind)):
+            if path in rebind:
+                bind_module(library, repo, path, lazy)
+    repo.reload_listeners.append(listener)
+
+def dependency_order(repo, paths):
+    """
+        Return the paths of the modules *paths* and of all modules they
+        import, directly or not, ordered so that each module comes after
+        the modules it imports (except for import cycles).
+    """
+    order = []
+    seen = set()
+    for root in paths:
+        if root in seen:
+            continue
+        seen.add(root)
+        # iterative depth-first search, emitting modules in postorder.
+        stack = [(root, iter(repo.get_module(root).global_imports))]
+        while stack:
+            path, imports = stack[-1]
+            for import_path in imports:
+                if import_path not in seen:
+                    seen.add(import_path)
+                    stack.append((import_path,
+                                  iter(repo.get_module(import_path).global_imports)))
+                    break
+            else:
+                stack.pop()
+                order.append(path)
+    return order
+
+def bind_closure(library, repo, paths, lazy=False):
+    """
+        Bind the modules *paths* and all modules they import, directly or
+        not. Each module is bound once, after the modules it imports: first
+        the types of all of them are declared, then they are bound (see
+        `bind_module`; *lazy* is passed on). Modules that are bound already
+        are skipped.
+
+        Return an ordered dictionary mapping the paths of the modules bound
+        to the seconds it took to bind them.
+    """
+    order = dependency_order(repo, paths)
+    for path in order:
+        bind_module_minimal(library, repo, path)
+    timings = odict()
+    for path in order:
+        if path == 'lang/types' or path in library._bound_modules:
+            continue
+        start = time.time()
+        bind_module(library, repo, path, lazy)
+        timings[path] = time.time() - start
+    return timings
+
+def bind_repository(library, repo, lazy=False):
+    """
+        Bind all modules of the repository *repo*, see `bind_closure`.
+    """
+    return bind_closure(library, repo, repo.get_all_paths(), lazy)
 
+# We import it here because it needs the stuff above.
+from pyooc.bind import plan
@@ -0,0 +1,233 @@
+"""
+    Ahead-of-time binding: generate a plain Python module that binds an
+    ooc module to a `pyooc.ffi.Library` exactly like
+    :func:`pyooc.bind.bind_module` does, but with all tags already
+    resolved, so importing and binding it needs neither the JSON
+    repository nor any type resolution::
+
+        write_module(repo, 'test', 'test_binding.py')
+        ...
+        import test_binding
+        test = test_binding.bind(lib)
+"""
+from pyooc.bind import SorryError, dependency_order
+from pyooc.bind.plan import typeref, c_typeref, analyze_declarations, analyze_module
+
+HEADER = '''\
+# Generated by pyooc.bind.codegen from the ooc module %(path)r.
+# Don't edit this, regenerate it.
+import ctypes
+
+import pyooc.ffi as ffi
+from pyooc import timing
+from pyooc.bind.plan import get_type, lookup_type, declare_module
+'''
+
+def _str(s):
+    return repr(str(s))
+
+def _list(exprs):
+    return '[%s]' % ', '.join(exprs)
+
+def _has_lookup(ref):
+    if ref is None or isinstance(ref, basestring):
+        return False
+    elif ref[0] == 'lookup':
+        return True
+    elif ref[0] == 'pointer':
+        return _has_lookup(ref[1])
+    elif ref[0] == 'multi':
+        return any(_has_lookup(r) for r in ref[1])
+    elif ref[0] == 'closure':
+        return any(_has_lookup(r) for r in ref[1]) or _has_lookup(ref[2])
+    return False
+
+def ref_expr(ref, path):
+    """
+        Return a Python expression for the type reference *ref* (see
+        `pyooc.bind.plan`) in the ooc module *path*. It's evaluated in a
+        scope with `library`, `types` (`library.types`) and `module` (the
+        `pyooc.ffi.Module` of *path*).
+    """
+    if ref is None:
+        return 'None'
+    elif isinstance(ref, basestring):
+        # generic.
+        return _str(ref)
+    kind = ref[0]
+    if kind == 'module':
+        if ref[1] == path:
+            return 'module.%s' % ref[2]
+        return 'library.get_module(%s).%s' % (_str(ref[1]), ref[2])
+    elif kind == 'types':
+        return 'types.%s' % ref[1]
+    elif kind == 'pointer':
+        return 'ctypes.POINTER(%s)' % ref_expr(ref[1], path)
+    elif kind == 'multi':
+        return '(%s,)' % ', '.join(ref_expr(r, path) for r in ref[1])
+    elif kind == 'closure':
+        if _has_lookup(ref):
+            # might fall back to `types.Closure`, see `pyooc.bind.plan.get_type`.
+            return 'get_type(library, %r)' % (ref,)
+        return 'types.get_closure_type(%s, [%s])' % (
+            ref_expr(ref[2], path), ', '.join(ref_expr(r, path) for r in ref[1]))
+    elif kind == 'c':
+        return 'ctypes.%s' % ref[1]
+    elif kind == 'lookup':
+        return 'lookup_type(library, %s, %s, %s)' % (
+            _list(map(_str, ref[1])), _str(ref[2]), ref_expr(ref[3], path))
+    raise SorryError('Unknown type reference: %r' % (ref,))
+
+def type_expr(repo, parser_module, tag):
+    """
+        Return a Python expression for the ctypes type of *tag* in
+        the ooc module *parser_module*, see `ref_expr`.
+    """
+    return ref_expr(typeref(repo, parser_module, tag), parser_module.path)
+
+def c_type_expr(repo, parser_module, typename):
+    """
+        Like `type_expr`, but for C type names (see `resolve_c_type`).
+    """
+    return ref_expr(c_typeref(repo, parser_module, typename), parser_module.path)
+
+class ModuleGenerator(object):
+    """
+        Generates the binding code of the ooc module *path*.
+    """
+    def __init__(self, repo, path):
+        self.repo = repo
+        self.path = path
+        self.lines = []
+
+    def emit(self, line='', indent=1):
+        self.lines.append('    ' * indent + line if line else '')
+
+    def generate(self):
+        self.lines.append(HEADER % {'path': str(self.path)})
+        if self.path == 'lang/types':
+            self.lines.append('def bind(library):')
+            self.emit('return None')
+            return '\n'.join(self.lines) + '\n'
+        plan = analyze_module(self.repo, self.path)
+        # One function per module doing the minimal binding, for all
+        # modules used (struct covers are laid out right away) ...
+        minimal_paths = dependency_order(self.repo, [self.path])
+        minimal_functions = {}
+        for path in minimal_paths:
+            if path == 'lang/types' or path in minimal_functions:
+                continue
+            minimal_functions[path] = name = '_declare_%d' % len(minimal_functions)
+            if path == self.path:
+                self.generate_minimal(plan, name)
+            else:
+                self.generate_minimal(analyze_declarations(self.repo, path), name)
+        # ... and one doing the real stuff, timed like `bind_module`.
+        self.lines.append('def bind(library):')
+        self.emit('"""')
+        self.emit('    Bind the ooc module %r to *library* and return it.' % str(self.path))
+        self.emit('"""')
+        self.emit('with timing.module(%s):' % _str(self.path))
+        self.emit('return _bind(library)', 2)
+        self.lines.append('')
+        self.lines.append('def _bind(library):')
+        self.emit('module = library.get_module(%s)' % _str(self.path))
+        self.emit('if %s in library._bound_modules:' % _str(self.path))
+        self.emit('return module', 2)
+        for path in minimal_paths:
+            if path in minimal_functions:
+                self.emit('%s(library)' % minimal_functions[path])
+        self.emit('types = library.types')
+        for kind, name, member_plan in plan['members']:
+            if kind == 'class':
+                self.generate_class(member_plan)
+            elif kind == 'function':
+                self.generate_function(member_plan)
+            else:
+                self.generate_global_variable(name, member_plan)
+        self.emit('library._bound_modules.add(%s)' % _str(self.path))
+        self.emit('return module')
+        return '\n'.join(self.lines) + '\n'
+
+    def expr(self, ref):
+        return ref_expr(ref, self.path)
+
+    def generate_minimal(self, module_plan, function_name):
+        # declarations are plain data, see `pyooc.bind.plan.declare_module`.
+        self.lines.append('def %s(library):' % function_name)
+        self.emit('declare_module(library, %r)' % ({
+            'path': module_plan['path'],
+            'declare': module_plan['declare'],
+        },))
+        self.lines.append('')
+
+    def generate_function(self, analyzed):
+        name = str(analyzed['name'])
+        return_type = self.expr(analyzed['return_type'])
+        arguments = _list(map(self.expr, analyzed['arguments']))
+        self.emit('# %s' % name)
+        # not exported, don't bother (see `pyooc.bind.plan.apply_function`).
+        self.emit('if module.has_member(%s):' % _str(name))
+        if analyzed['generic_types'] or analyzed['return_type'] and analyzed['return_type'][0] == 'multi':
+            self.emit('func = module.generic_function(%s, %s, %s, %s)' % (
+                _str(name), _list(map(_str, analyzed['generic_types'])),
+                return_type, arguments), 2)
+        else:
+            self.emit('func = module[%s]' % _str(name), 2)
+            self.emit('func.restype = %s' % return_type, 2)
+            self.emit('func.argtypes = %s' % arguments, 2)
+        # names can contain `~`.
+        self.emit('setattr(module, %s, func)' % _str(name), 2)
+
+    def generate_global_variable(self, name, ref):
+        self.emit('setattr(module, %s, module.global_variable(%s, %s))' % (
+            _str(name), _str(name), self.expr(ref)))
+
+    def generate_class(self, class_plan):
+        funcs = []
+        for analyzed in class_plan['methods']:
+            args = [_str(analyzed['name'])]
+            if analyzed['generic_types'] or analyzed['generic_return_type']:
+                args.append('generictypes=%s' % _list(map(_str, analyzed['generic_types'])))
+            args.extend([
+                'restype=%s' % self.expr(analyzed['return_type']),
+                'argtypes=%s' % _list(map(self.expr, analyzed['arguments'])),
+                'static=%r' % analyzed['static'],
+                'overrides=%r' % analyzed['overrides'],
+            ])
+            funcs.append('ffi.Func(%s)' % ', '.join(args))
+        def field_expr(field):
+            exprs = [_str(field[0]), self.expr(field[1])]
+            # property getter and setter names
+            exprs.extend(repr(name and str(name)) for name in field[2:])
+            return '(%s)' % ', '.join(exprs)
+        name = class_plan['name']
+        self.emit('# %s' % name)
+        self.emit('cls = module.%s' % name)
+        self.emit('cls.declare(')
+        self.emit('%s,' % _str(name), 2)
+        self.emit('%s,' % _list(map(field_expr, class_plan['fields'])), 2)
+        self.emit('%s,' % _list(map(field_expr, class_plan['static_fields'])), 2)
+        self.emit('[', 2)
+        for func in funcs:
+            self.emit('%s,' % func, 3)
+        self.emit('],', 2)
+        self.emit('%s,' % self.expr(class_plan['extends']), 2)
+        self.emit('%s)' % _list(map(_str, class_plan['generic_types'] or [])), 2)
+        self.emit('cls.bind(module)')
+
+def generate_module(repo, path):
+    """
+        Return the source code of a Python module binding the ooc module
+        *path* of the `pyooc.parser.Repository` *repo*. The module has
+        a function `bind(library)` that returns the bound
+        `pyooc.ffi.Module`.
+    """
+    return ModuleGenerator(repo, path).generate()
+
+def write_module(repo, path, filename):
+    """
+        Write the output of `generate_module` to *filename*.
+    """
+    with open(filename, 'w') as f:
+        f.write(generate_module(repo, path))
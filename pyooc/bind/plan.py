@@ -0,0 +1,578 @@
+"""
+    Binding in two steps: the analysis step only looks at the parser
+    entities and produces a *binding plan*, plain data that can be
+    pickled, and the apply step binds a plan to a `pyooc.ffi.Library`.
+    `pyooc.bind.bind_module` does both for one module. The analysis can
+    also run in a process pool, and a plan can be saved to disk so it
+    doesn't have to be repeated::
+
+        plan = load_plan('sdk.plan', repo)
+        if plan is None:
+            plan = make_plan(repo, ['test'], workers=4)
+            save_plan(plan, 'sdk.plan')
+        apply_plan(lib, plan)
+
+    Types are described by *type references*, tuples that `apply_plan`
+    turns into the actual types:
+
+     * ``('module', path, name)``: the type *name* of the module *path*
+     * ``('types', name)``: ``library.types.<name>``
+     * ``('pointer', ref)``: a pointer to *ref*
+     * ``('multi', (ref, ...))``: a multi-value return type
+     * ``('closure', (ref, ...), ref)``: a typed closure with these
+       argument types and return type (see `pyooc.ffi.types.Types.get_closure_type`)
+     * ``('c', name)``: ``ctypes.<name>``
+     * ``('lookup', (path, ...), name, default)``: a name the repository
+       doesn't know as a type, looked up in the modules *paths* when the
+       plan is applied (see `lookup_type`). If it isn't found, it's the
+       type reference *default*, or an error if that's None.
+
+    Generic types are just their names.
+"""
+import ctypes
+import multiprocessing
+import cPickle as pickle
+from functools import partial
+
+import pyooc.ffi as ffi
+import pyooc.parser as parser
+from pyooc.ffi.types import TYPE_NAMES
+from pyooc.parser import Repository
+from pyooc.parser.odict import odict
+from pyooc.parser.tag import parse_string as parse_tag
+from pyooc import timing
+from pyooc.files import atomic_write
+from pyooc.bind import C_TYPES_MAP, SorryError, dependency_order, ensure_bound, func_signature
+
+#: Increase this if the format of plans changes.
+PLAN_VERSION = 4
+
+def _is_classlike(member):
+    return isinstance(member, (parser.Class, parser.Cover))
+
+def typeref(repo, parser_module, tag, default=None):
+    """
+        Return the type reference of *tag* in the ooc module *parser_module*:
+        a class or cover of the module, a type of `pyooc.ffi.types.Types`
+        or a class or cover of an imported module, in that order. Other
+        names are looked up when the plan is applied, falling back to
+        the type reference *default*.
+    """
+    if '(' in tag:
+        # has modifiers.
+        mod, args = parse_tag(tag)
+        if mod in ('pointer', 'reference'):
+            return ('pointer', typeref(repo, parser_module, args[0]))
+        elif mod == 'Func':
+            signature = func_signature(args)
+            if signature is not None:
+                return ('closure',
+                        tuple(typeref(repo, parser_module, arg) for arg in signature[0]),
+                        signature[1] and typeref(repo, parser_module, signature[1]))
+            return ('types', 'Closure')
+        else:
+            raise SorryError('Unknown tag: %r' % tag)
+    else:
+        member = parser_module.members.get(tag)
+        if member is not None and _is_classlike(member):
+            return ('module', parser_module.path, tag)
+        if tag in TYPE_NAMES:
+            return ('types', tag)
+        elif tag == 'Func':
+            # no signature.
+            return ('types', 'Closure')
+        # TODO: namespaced imports
+        for import_path in parser_module.global_imports:
+            if import_path == 'lang/types':
+                # never bound, see `bind_module`.
+                continue
+            member = repo.get_module(import_path).members.get(tag)
+            if member is not None and _is_classlike(member):
+                return ('module', import_path, tag)
+        # Maybe the library has it anyway.
+        return ('lookup', (parser_module.path,) + tuple(parser_module.global_imports),
+                tag, default)
+
+def c_typeref(repo, parser_module, typename):
+    """
+        Like `typeref`, but for C type names (see `pyooc.bind.resolve_c_type`).
+    """
+    if typename in C_TYPES_MAP:
+        return ('c', C_TYPES_MAP[typename].__name__)
+    elif typename.endswith('*'):
+        return ('pointer', c_typeref(repo, parser_module, typename[:-1]))
+    else:
+        # maybe it's a ooc type.
+        return typeref(repo, parser_module, typename, ('c', 'c_void_p'))
+
+def analyze_function(repo, parser_module, cls_entity, entity):
+    """
+        Return the plan of the function or method *entity* (of the class
+        *cls_entity*, or None).
+    """
+    generic_types = set(entity.generic_types)
+    if cls_entity is not None:
+        generic_types.update(getattr(cls_entity, 'generic_types', None) or ())
+    def ref(tag):
+        if tag in generic_types:
+            return tag
+        return typeref(repo, parser_module, tag)
+    if entity.return_type is None:
+        return_type = None
+    elif entity.return_type.startswith('multi('):
+        return_type = ('multi', tuple(ref(rtype) for rtype in parse_tag(entity.return_type)[1]))
+    else:
+        return_type = ref(entity.return_type)
+    return {
+        'name': entity.name,
+        'arguments': [ref(arg.tag) for arg in entity.arguments],
+        'generic_types': list(entity.generic_types),
+        'return_type': return_type,
+        'generic_return_type': isinstance(return_type, basestring),
+        'static': 'static' in entity.modifiers,
+    }
+
+def analyze_class(repo, parser_module, entity):
+    """
+        Return the plan of the class or cover *entity*.
+    """
+    generic_types = getattr(entity, 'generic_types', None) or []
+    methods = []
+    fields = []
+    static_fields = []
+    for name, member in entity.members.iteritems():
+        if isinstance(member, parser.Method):
+            analyzed = analyze_function(repo, parser_module, entity, member)
+            analyzed['overrides'] = member.overrides
+            methods.append(analyzed)
+        elif isinstance(member, parser.Field):
+            if member.type in generic_types:
+                var_type = member.type
+            else:
+                var_type = typeref(repo, parser_module, member.type)
+            if member.name in generic_types:
+                # skip the T/U/V... members, they're added in _setup
+                continue
+            if member.property_data is not None:
+                field = (member.name,
+                         var_type,
+                         member.property_data.full_getter_name,
+                         member.property_data.full_setter_name)
+            else:
+                field = (member.name, var_type)
+            if 'static' in member.modifiers:
+                static_fields.append(field)
+            else:
+                fields.append(field)
+        else:
+            print 'ignored', member
+    if entity.extends:
+        extends = typeref(repo, parser_module, entity.extends)
+    else:
+        extends = None
+    return {
+        'name': entity.name,
+        'fields': fields,
+        'static_fields': static_fields,
+        'methods': methods,
+        'extends': extends,
+        'generic_types': getattr(entity, 'generic_types', None),
+    }
+
+def analyze_layout(repo, parser_module, entity):
+    """
+        Return the layout of the struct cover *entity*: the type reference
+        of the cover it extends (or None) and a list of ``(name, ref)``
+        tuples for its fields. Static fields and properties aren't part
+        of it.
+    """
+    generic_types = getattr(entity, 'generic_types', None) or []
+    fields = []
+    for name, member in entity.members.iteritems():
+        if (not isinstance(member, parser.Field)
+            or member.property_data is not None
+            or 'static' in member.modifiers
+            or member.name in generic_types):
+            continue
+        if member.type in generic_types:
+            fields.append((member.name, member.type))
+        else:
+            fields.append((member.name, typeref(repo, parser_module, member.type)))
+    if entity.extends:
+        extends = typeref(repo, parser_module, entity.extends)
+    else:
+        extends = None
+    return (extends, fields)
+
+def analyze_declarations(repo, path):
+    """
+        Return the part of the plan of the ooc module *path* that declares
+        its types: a dictionary with its path (``'path'``) and the types
+        (``'declare'``, a list of ``(name, kind, from_, layout)`` tuples,
+        *from_* being the type reference of a cover's base type and
+        *layout* the `analyze_layout` of a struct cover).
+    """
+    entity = repo.get_module(path)
+    declare = []
+    for name, member in entity.members.iteritems():
+        if isinstance(member, parser.Class):
+            declare.append((name, 'class', None, None))
+        elif isinstance(member, parser.Cover):
+            if member.from_:
+                declare.append((name, 'cover', c_typeref(repo, entity, member.from_), None))
+            else:
+                declare.append((name, 'cover', None, analyze_layout(repo, entity, member)))
+    return {
+        'path': path,
+        'declare': declare,
+    }
+
+def analyze_module(repo, path):
+    """
+        Return the plan of the ooc module *path*: `analyze_declarations`
+        and the members to bind (``'members'``, a list of ``(kind, name,
+        plan)`` tuples).
+    """
+    entity = repo.get_module(path)
+    module_plan = analyze_declarations(repo, path)
+    members = []
+    for name, member in entity.members.iteritems():
+        if _is_classlike(member):
+            members.append(('class', name, analyze_class(repo, entity, member)))
+        elif isinstance(member, parser.Function):
+            members.append(('function', name, analyze_function(repo, entity, None, member)))
+        elif (isinstance(member, parser.GlobalVariable) and
+              not member.name.startswith('__')): # ignore string literals
+            members.append(('global', name, typeref(repo, entity, member.type)))
+        else:
+            print 'Ignoring member: %s (%r)' % (name, member)
+    module_plan['members'] = members
+    return module_plan
+
+def make_plan(repo, paths, workers=1):
+    """
+        Analyze the modules *paths* and all modules they import (see
+        `pyooc.bind.bind_closure`) and return the binding plan. If
+        *workers* is greater than 1, the modules are analyzed in a pool
+        of that many processes.
+    """
+    order = [path for path in dependency_order(repo, paths) if path != 'lang/types']
+    modules = odict()
+    if workers > 1 and len(order) > 1:
+        pool = multiprocessing.Pool(workers, _init_worker,
+                                    (repo.path, repo.cache, repo.cache_dir))
+        try:
+            chunksize = max(1, len(order) // (workers * 4))
+            analyzed = dict(pool.imap_unordered(_analyze_worker, order, chunksize))
+        finally:
+            pool.close()
+            pool.join()
+        for path in order:
+            modules[path] = analyzed[path]
+    else:
+        for path in order:
+            modules[path] = analyze_module(repo, path)
+    return {
+        'version': PLAN_VERSION,
+        'stamps': dict((path, _get_stamp(repo, path)) for path in order),
+        'modules': modules,
+    }
+
+def _get_stamp(repo, path):
+    return repo._get_stamp(repo.get_module_filename(path))
+
+def plan_is_current(plan, repo):
+    """
+        Return True if none of the module descriptions in *repo* the plan
+        *plan* was made from changed since.
+    """
+    try:
+        return all(_get_stamp(repo, path) == stamp
+                   for path, stamp in plan['stamps'].iteritems())
+    except parser.ModuleNotFound:
+        # a module description was removed.
+        return False
+
+def save_plan(plan, filename):
+    """
+        Write the plan *plan* to *filename*.
+    """
+    with atomic_write(filename) as f:
+        pickle.dump(plan, f, pickle.HIGHEST_PROTOCOL)
+
+def load_plan(filename, repo=None):
+    """
+        Read a plan written by `save_plan`. Return None if there is no
+        usable plan in *filename*, or if *repo* is given and the plan is
+        outdated.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            plan = pickle.load(f)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if not isinstance(plan, dict) or plan.get('version') != PLAN_VERSION:
+        return None
+    if repo is not None and not plan_is_current(plan, repo):
+        return None
+    return plan
+
+def get_type(library, ref):
+    """
+        Return the type the type reference *ref* stands for. The results
+        are cached by the library, see `pyooc.ffi.Library.invalidate_type_cache`.
+    """
+    if ref is None or isinstance(ref, basestring):
+        # void or generic.
+        return ref
+    try:
+        typ = library._type_cache[ref]
+    except KeyError:
+        library.type_cache_stats['misses'] += 1
+    else:
+        library.type_cache_stats['hits'] += 1
+        return typ
+    with timing.phase('resolve'):
+        typ = _get_type(library, ref)
+    library._type_cache[ref] = typ
+    return typ
+
+def _get_type(library, ref):
+    kind = ref[0]
+    if kind == 'module':
+        typ = library.get_module(ref[1]).get_type(ref[2])
+        if typ is None:
+            raise ffi.BindingError('%s has no type %r' % (ref[1], ref[2]))
+    elif kind == 'types':
+        typ = getattr(library.types, ref[1])
+    elif kind == 'pointer':
+        typ = ctypes.POINTER(get_type(library, ref[1]))
+    elif kind == 'multi':
+        typ = tuple(get_type(library, r) for r in ref[1])
+    elif kind == 'closure':
+        try:
+            argtypes = [get_type(library, r) for r in ref[1]]
+            restype = get_type(library, ref[2])
+            typ = library.types.get_closure_type(restype, argtypes)
+        except (SorryError, TypeError):
+            # generic, or something ctypes can't call back.
+            typ = library.types.Closure
+    elif kind == 'c':
+        typ = getattr(ctypes, ref[1])
+    elif kind == 'lookup':
+        typ = lookup_type(library, ref[1], ref[2], get_type(library, ref[3]))
+    else:
+        raise ffi.BindingError('Unknown type reference: %r' % (ref,))
+    return typ
+
+def lookup_type(library, paths, name, default=None):
+    """
+        Return the member *name* of the first of the modules *paths* that
+        has it (see `pyooc.ffi.Module.get_type`). If none has, return
+        *default*, or raise a `pyooc.bind.SorryError` if that's None.
+    """
+    for path in paths:
+        typ = library.get_module(path).get_type(name)
+        if typ is not None:
+            return typ
+    if default is None:
+        raise SorryError('Unknown type: %r' % name)
+    print 'Unknown type: %r' % name
+    return default
+
+def _layout_order(path, layouts):
+    """
+        Return the names of the struct covers *layouts* (name -> layout)
+        of the module *path*, each after the covers of the module it
+        extends or embeds.
+    """
+    order = []
+    seen = set()
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        extends, fields = layouts[name]
+        for ref in [extends] + [field[1] for field in fields]:
+            if (isinstance(ref, tuple) and ref[0] == 'module'
+                and ref[1] == path and ref[2] in layouts):
+                visit(ref[2])
+        order.append(name)
+    for name in layouts:
+        visit(name)
+    return order
+
+def lay_out_cover(library, cls, layout):
+    """
+        Lay out the struct cover *cls* (see `pyooc.ffi.Cover.lay_out`)
+        as described by *layout* (see `analyze_layout`). If its types
+        can't be resolved, it's left to `apply_class`.
+    """
+    extends, fields = layout
+    try:
+        extends = get_type(library, extends)
+        fields = [(name, get_type(library, ref)) for name, ref in fields]
+    except SorryError, e:
+        print 'Not laying out %r: %s' % (cls, e)
+        return
+    cls.lay_out(fields, extends)
+
+def declare_type(library, module, name, kind, from_=None):
+    """
+        Declare the type *name* of *module* (see `analyze_declarations`
+        for *kind* and *from_*) and return it. Struct covers aren't laid
+        out yet. If the module has a type of that name already, it's kept
+        and None is returned.
+    """
+    if name in module._declared:
+        # don't replace a class that might be bound already.
+        return None
+    if kind == 'class':
+        cls = type(str(name), (ffi.Class,), {})
+    elif from_ is not None:
+        cls = type(str(name), (get_type(library, from_), ffi.Cover), {})
+    else:
+        cls = type(str(name), (ffi.Cover, ctypes.Structure), {})
+    module.declare_type(name, cls)
+    return cls
+
+def declare_module(library, module_plan):
+    """
+        Declare the types of a module plan (see `analyze_declarations`),
+        so they can be used before they're bound. Types that are declared
+        already are kept. Struct covers are laid out right away, so the
+        types of the modules they use have to be declared before.
+    """
+    path = module_plan['path']
+    if path in library._declared_modules:
+        return
+    library._declared_modules.add(path)
+    module = library.get_module(path)
+    declared = []
+    layouts = odict()
+    for name, kind, from_, layout in module_plan['declare']:
+        if declare_type(library, module, name, kind, from_) is None:
+            continue
+        if kind == 'cover' and from_ is None:
+            layouts[name] = layout
+        declared.append(name)
+    if declared and library._type_cache:
+        # Type references that were looked up before might mean the new types now.
+        library.invalidate_type_cache(names=declared)
+    for name in _layout_order(path, layouts):
+        lay_out_cover(library, module.get_type(name), layouts[name])
+
+def apply_class(library, module, class_plan):
+    """
+        Bind a class plan. Works for classes and covers!
+    """
+    funcs = []
+    for analyzed in class_plan['methods']:
+        restype = get_type(library, analyzed['return_type'])
+        argtypes = [get_type(library, ref) for ref in analyzed['arguments']]
+        if (analyzed['generic_types'] or analyzed['generic_return_type']):
+            funcs.append(ffi.Func(analyzed['name'],
+                generictypes=analyzed['generic_types'],
+                restype=restype,
+                argtypes=argtypes,
+                overrides=analyzed['overrides'],
+                static=analyzed['static']))
+        else:
+            funcs.append(ffi.Func(analyzed['name'],
+                restype=restype,
+                argtypes=argtypes,
+                static=analyzed['static'],
+                overrides=analyzed['overrides']))
+    fields = []
+    static_fields = []
+    for plan_fields, fields_ in ((class_plan['fields'], fields),
+                                 (class_plan['static_fields'], static_fields)):
+        for field in plan_fields:
+            fields_.append((field[0], get_type(library, field[1])) + tuple(field[2:]))
+    super_class = get_type(library, class_plan['extends'])
+    ensure_bound(super_class)
+    # Finally, create the class.
+    cls = getattr(module, class_plan['name'])
+    cls.declare(class_plan['name'], fields, static_fields, funcs, super_class,
+                class_plan['generic_types']) # isn't needed in Class/Cover, but we do it anyway.
+    cls.bind(module)
+
+def apply_function(library, module, analyzed):
+    """
+        Bind a function plan.
+    """
+    if not module.has_member(analyzed['name']):
+        # not exported, don't bother.
+        return
+    restype = get_type(library, analyzed['return_type'])
+    argtypes = [get_type(library, ref) for ref in analyzed['arguments']]
+    if (analyzed['generic_types'] or isinstance(restype, tuple)):
+        # Is generic or is multi-value return. Use `generic_function`.
+        wrapper = module.generic_function(
+            analyzed['name'],
+            analyzed['generic_types'],
+            restype,
+            argtypes,
+        )
+    else:
+        # Anything else - just a normal function.
+        wrapper = module[analyzed['name']]
+        wrapper.restype = restype
+        wrapper.argtypes = argtypes
+    setattr(module, analyzed['name'], wrapper)
+
+def apply_global_variable(library, module, name, ref):
+    """
+        Bind a global variable.
+    """
+    setattr(module, name, module.global_variable(name, get_type(library, ref)))
+
+def apply_module(library, module_plan, lazy=False):
+    """
+        Bind the members of a module plan whose types are declared already
+        (see `declare_module`) and return the `pyooc.ffi.Module`. If *lazy*
+        is true, the members are bound the first time they're accessed
+        (see `pyooc.ffi.Module.add_lazy_member`); classes needed by them
+        are bound on the way.
+    """
+    with timing.module(module_plan['path']):
+        module = library.get_module(module_plan['path'])
+        for kind, name, member_plan in module_plan['members']:
+            if kind == 'class':
+                binder = partial(apply_class, library, module, member_plan)
+            elif kind == 'function':
+                binder = partial(apply_function, library, module, member_plan)
+            else:
+                binder = partial(apply_global_variable, library, module, name, member_plan)
+            if lazy:
+                module.add_lazy_member(name, binder)
+            else:
+                binder()
+        library._bound_modules.add(module_plan['path'])
+    return module
+
+def apply_plan(library, plan, lazy=False):
+    """
+        Bind all modules of the plan *plan* to *library*, in the order of
+        `pyooc.bind.bind_closure`. Modules that are bound already are
+        skipped. If *lazy* is true, members are bound on first access.
+        Return the list of the bound `pyooc.ffi.Module` instances.
+    """
+    for module_plan in plan['modules'].itervalues():
+        declare_module(library, module_plan)
+    modules = []
+    for path, module_plan in plan['modules'].iteritems():
+        if path in library._bound_modules:
+            continue
+        modules.append(apply_module(library, module_plan, lazy))
+    return modules
+
+#: The repository of a `make_plan` worker process.
+_worker_repo = None
+
+def _init_worker(path, cache, cache_dir):
+    global _worker_repo
+    _worker_repo = Repository(path, cache, cache_dir)
+
+def _analyze_worker(path):
+    return path, analyze_module(_worker_repo, path)
@@ -1,8 +1,13 @@
 import os
+import time
+import hashlib
 import tempfile
 import shutil
+from distutils.spawn import find_executable
 from subprocess import Popen, PIPE
+from multiprocessing.pool import ThreadPool
 
+from pyooc.files import makedirs
 from pyooc.ffi import Library
 from pyooc.parser import Repository
 from pyooc.bind import bind_module
@@ -10,51 +15,175 @@ from pyooc.bind import bind_module
 class CompileError(Exception):
     pass
 
-def compile_and_bind(sourcecode, compiler='rock'):
-    # Create temporary files for the sourcecode ...
-    source_fd, source_filename = tempfile.mkstemp('.ooc')
-    source_dirname, source_basename = os.path.split(source_filename)
-    modulename = os.path.splitext(source_basename)[0]
-    os.close(source_fd)
-    # ... and the library. TODO: Other platforms!
-    lib_fd, lib_filename = tempfile.mkstemp('.so')
-    soname = os.path.splitext(os.path.basename(lib_filename))[0]
-    os.close(lib_fd)
-    # And a temporary directory for the json repository.
-    repo_dir = tempfile.mkdtemp('.repo')
-    # Write the sourcecode.
-    with open(source_filename, 'w') as f:
-        f.write(sourcecode)
+#: Increase this if the layout of build cache entries changes.
+CACHE_VERSION = 1
+
+#: Flags for building the shared library, besides the output file and soname.
+COMPILE_FLAGS = ['-nolibcache', '-noclean', '-g', '+-shared', '+-fPIC']
+
+#: Unfinished builds older than this (in seconds) are removed by `prune_cache`.
+STALE_BUILD_AGE = 24 * 60 * 60
+
+def _start(args, cwd):
+    return Popen(args,
+                 cwd=cwd, # TODO: rock absolute path bug workaround
+                 stdout=PIPE,
+                 stderr=PIPE)
+
+def _wait(proc, what, other=None):
+    """
+        Wait for *proc* and raise a `CompileError` if it failed, killing
+        *other* in that case.
+    """
+    stdout, stderr = proc.communicate()
+    if proc.returncode != 0:
+        if other is not None and other.poll() is None:
+            other.kill()
+            other.communicate()
+        raise CompileError('%s fail! stdout=%s, stderr=%s' % (what, stdout, stderr))
+
+def _build(compiler, source_dirname, source_basename, lib_filename, soname, repo_dir):
+    """
+        Compile the ooc source file *source_basename* in *source_dirname*
+        to the shared library *lib_filename* and write its JSON repository
+        to *repo_dir*. Both compilers run at the same time, the JSON backend
+        in a copy of the source in a subdirectory: rock keeps its
+        intermediate files (``rock_tmp``, ``.libs``) in the working directory.
+    """
+    json_dirname = tempfile.mkdtemp(prefix='.json-', dir=source_dirname)
+    try:
+        shutil.copy(os.path.join(source_dirname, source_basename), json_dirname)
+        # Compile it ...
+        compile_proc = _start([compiler,
+              '-o=%s' % lib_filename] + COMPILE_FLAGS + [
+              '+-Wl,-export-dynamic,-soname,%s' % soname,
+              source_basename],
+             source_dirname)
+        # ... and create the repository, invoke the JSON backend.
+        try:
+            json_proc = _start([compiler,
+                  '-backend=json',
+                  '-outpath=%s' % repo_dir,
+                  source_basename],
+                 json_dirname)
+        except:
+            compile_proc.kill()
+            compile_proc.wait()
+            raise
+        _wait(compile_proc, 'Compile', json_proc)
+        _wait(json_proc, 'JSON backend')
+    finally:
+        shutil.rmtree(json_dirname, ignore_errors=True)
+
+def _compiler_identity(compiler):
+    filename = find_executable(compiler) or compiler
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return filename
+    return '%s:%r:%d' % (os.path.abspath(filename), st.st_mtime, st.st_size)
+
+def get_cache_key(sourcecode, compiler='rock'):
+    """
+        Return the key of the build cache entry for *sourcecode* compiled
+        by *compiler*: a hash of the source, the compiler executable and
+        the flags.
+    """
+    if isinstance(sourcecode, unicode):
+        sourcecode = sourcecode.encode('utf-8')
+    sha = hashlib.sha1()
+    for part in (str(CACHE_VERSION), _compiler_identity(compiler), repr(COMPILE_FLAGS), sourcecode):
+        sha.update(part)
+        sha.update('\0')
+    return sha.hexdigest()
+
+def _build_cached(sourcecode, compiler, cache_dir, key, modulename):
+    """
+        Build *sourcecode* into the cache entry *key*. The build happens
+        in a temporary directory that is renamed to the entry when it's
+        done, so other processes never see a half-built entry. If some
+        other process was faster, its entry is used.
+    """
+    entry = os.path.join(cache_dir, key)
+    makedirs(cache_dir)
+    build_dir = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+    try:
+        source_basename = modulename + '.ooc'
+        with open(os.path.join(build_dir, source_basename), 'w') as f:
+            f.write(sourcecode)
+        _build(compiler, build_dir, source_basename,
+               os.path.join(build_dir, modulename + '.so'), modulename,
+               os.path.join(build_dir, 'repo'))
+        # Only the library, the repository and the source are needed.
+        for name in os.listdir(build_dir):
+            if name not in (source_basename, modulename + '.so', 'repo'):
+                path = os.path.join(build_dir, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+        try:
+            os.rename(build_dir, entry)
+        except OSError:
+            if not os.path.isdir(entry):
+                raise
+    finally:
+        if os.path.isdir(build_dir):
+            shutil.rmtree(build_dir, ignore_errors=True)
+    return entry
+
+def _compile(sourcecode, compiler, cache_dir):
+    """
+        Build *sourcecode*. Return a tuple ``(lib_filename, repo_dir,
+        modulename, temporary)``, *temporary* being the list of files
+        and directories to remove after binding.
+    """
+    if cache_dir is not None:
+        # the compilers run in other directories.
+        cache_dir = os.path.abspath(cache_dir)
+        key = get_cache_key(sourcecode, compiler)
+        # the symbols are prefixed with the module name, keep it short.
+        modulename = 'cab_%s' % key[:16]
+        entry = os.path.join(cache_dir, key)
+        if os.path.isdir(entry):
+            try:
+                # mark it as used, see `prune_cache`.
+                os.utime(entry, None)
+            except OSError:
+                pass
+        else:
+            entry = _build_cached(sourcecode, compiler, cache_dir, key, modulename)
+        return (os.path.join(entry, modulename + '.so'), os.path.join(entry, 'repo'),
+                modulename, [])
+    # Build in a temporary directory of our own: the compiler leaves its
+    # intermediate files in the working directory, so concurrent builds
+    # mustn't share one. Its name is unique, so it's the module name too.
+    build_dir = tempfile.mkdtemp(prefix='tmp')
+    modulename = os.path.basename(build_dir)
+    source_basename = modulename + '.ooc'
+    # TODO: Other platforms!
+    lib_filename = os.path.join(build_dir, modulename + '.so')
+    repo_dir = os.path.join(build_dir, 'repo')
+    temporary = [build_dir]
+    try:
+        # Write the sourcecode.
+        with open(os.path.join(build_dir, source_basename), 'w') as f:
+            f.write(sourcecode)
+        _build(compiler, build_dir, source_basename, lib_filename, modulename, repo_dir)
+    except:
+        _cleanup(temporary)
+        raise
+    return lib_filename, repo_dir, modulename, temporary
+
+def _cleanup(temporary):
+    for path in temporary:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path) # TODO: <- That's okay for the library, isn't it?
+
+def _bind(lib_filename, repo_dir, modulename, temporary):
     try:
-        # Compile it.
-        proc = Popen([
-                    compiler,
-                    '-nolibcache',
-                    '-o=%s' % lib_filename,
-                    '-noclean',
-                    '-g',
-                    '+-shared',
-                    '+-fPIC',
-                    '+-Wl,-export-dynamic,-soname,%s' % soname,
-                    source_basename],
-                    cwd=source_dirname, # TODO: rock absolute path bug workaround
-                    stdout=PIPE,
-                    stderr=PIPE)
-        stdout, stderr = proc.communicate()
-        if proc.returncode != 0:
-            raise CompileError('Compile fail! stdout=%s, stderr=%s' % (stdout, stderr))
-        # Create the repository, invoke the JSON backend.
-        proc = Popen([
-                    compiler,
-                    '-backend=json',
-                    '-outpath=%s' % repo_dir,
-                    source_basename],
-                    cwd=source_dirname, # TODO: see above
-                    stdout=PIPE,
-                    stderr=PIPE)
-        stdout, stderr = proc.communicate()
-        if proc.returncode != 0:
-            raise CompileError('JSON backend fail! stdout=%s, stderr=%s' % (stdout, stderr))
         # Yay! Lib! Repo!
         lib = Library(lib_filename)
         repo = Repository(repo_dir)
@@ -62,7 +191,128 @@ def compile_and_bind(sourcecode, compiler='rock'):
         bind_module(lib, repo, modulename)
         return lib.get_module(modulename)
     finally:
-        # Cleanup.
-        os.remove(source_filename)
-        os.remove(lib_filename) # TODO: <- That's okay, isn't it?
-        shutil.rmtree(repo_dir)
+        _cleanup(temporary)
+
+def _bind_or_rebuild(build, sourcecode, compiler, cache_dir):
+    """
+        `_bind` the *build* `_compile` returned for *sourcecode*. If it's
+        a cache entry that `prune_cache` removed before or while it was
+        loaded, build it again and bind that.
+    """
+    try:
+        return _bind(*build)
+    except Exception:
+        if cache_dir is None or os.path.isdir(os.path.dirname(build[0])):
+            raise
+    return _bind(*_compile(sourcecode, compiler, cache_dir))
+
+def compile_and_bind(sourcecode, compiler='rock', cache_dir=None):
+    """
+        Compile the ooc code *sourcecode* to a shared library, bind it and
+        return the bound `pyooc.ffi.Module`.
+
+        If *cache_dir* is given, the library and the JSON repository are
+        kept there, keyed by `get_cache_key`, and the compiler isn't run
+        again for the same source. The cache can be shared by concurrent
+        processes; use `prune_cache` to keep it small.
+    """
+    return _bind_or_rebuild(_compile(sourcecode, compiler, cache_dir),
+                            sourcecode, compiler, cache_dir)
+
+def compile_and_bind_many(sources, compiler='rock', cache_dir=None, workers=4):
+    """
+        Like `compile_and_bind`, but for a list of sources, which are
+        compiled by up to *workers* compilers at a time. Return a list of
+        ``(module, error)`` tuples in the order of *sources*: *error* is
+        None if it worked, or the exception raised for that source
+        (*module* is None then).
+    """
+    sources = list(sources)
+    if not sources:
+        return []
+    def compile_one(sourcecode):
+        try:
+            return _compile(sourcecode, compiler, cache_dir), None
+        except Exception, e:
+            return None, e
+    pool = ThreadPool(max(1, min(workers, len(sources))))
+    try:
+        builds = pool.map(compile_one, sources, 1)
+    finally:
+        pool.close()
+        pool.join()
+    # Binding is quick and touches shared state, so do it here.
+    results = []
+    for sourcecode, (build, error) in zip(sources, builds):
+        if error is None:
+            try:
+                results.append((_bind_or_rebuild(build, sourcecode, compiler, cache_dir), None))
+            except Exception, e:
+                results.append((None, e))
+        else:
+            results.append((None, error))
+    return results
+
+def _get_size(path):
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+def _remove_entry(cache_dir, name):
+    # Rename it first, so nobody picks up a half-removed entry.
+    path = os.path.join(cache_dir, name)
+    trash = os.path.join(cache_dir, '.tmp-removed-%s-%d' % (name, os.getpid()))
+    try:
+        os.rename(path, trash)
+    except OSError:
+        # somebody else removed it.
+        return False
+    shutil.rmtree(trash, ignore_errors=True)
+    return True
+
+def prune_cache(cache_dir, max_size=None, max_age=None):
+    """
+        Remove build cache entries from *cache_dir* that weren't used for
+        more than *max_age* seconds, then the least recently used ones
+        until the cache takes at most *max_size* bytes. Unfinished builds
+        older than `STALE_BUILD_AGE` are removed, too.
+        Return the list of the keys of the removed entries.
+    """
+    now = time.time()
+    entries = []
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return []
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        if name.startswith('.tmp-'):
+            if now - mtime > STALE_BUILD_AGE:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+        entries.append((mtime, name))
+    removed = []
+    entries.sort()
+    if max_age is not None:
+        while entries and now - entries[0][0] > max_age:
+            mtime, name = entries.pop(0)
+            if _remove_entry(cache_dir, name):
+                removed.append(name)
+    if max_size is not None:
+        sizes = dict((name, _get_size(os.path.join(cache_dir, name))) for mtime, name in entries)
+        total = sum(sizes.itervalues())
+        while entries and total > max_size:
+            mtime, name = entries.pop(0)
+            total -= sizes[name]
+            if _remove_entry(cache_dir, name):
+                removed.append(name)
+    return removed
@@ -3,6 +3,8 @@ import ctypes.util
 import re
 from functools import partial
 
+from pyooc import timing
+
 class BindingError(Exception):
     pass
 
@@ -57,34 +59,229 @@ GC = ctypes.CDLL(ctypes.util.find_library('gc'), ctypes.RTLD_GLOBAL)
 
 _CData = ctypes._SimpleCData.__bases__[0] # I now feel evil.
 
+#: ctypes type codes of integers. Arguments of these types can be passed
+#: Python integers, ctypes converts them itself.
+INTEGER_CODES = frozenset('bBhHiIlLqQ?')
+
+def _mentions(ref, paths, names):
+    """
+        Return True if the type reference *ref* mentions a module of
+        *paths* or a type name of *names*, see `Library.invalidate_type_cache`.
+    """
+    if not isinstance(ref, tuple):
+        return False
+    kind = ref[0]
+    if kind == 'module':
+        return ref[1] in paths or ref[2] in names
+    elif kind == 'lookup':
+        return (ref[2] in names or not paths.isdisjoint(ref[1])
+                or _mentions(ref[3], paths, names))
+    elif kind == 'pointer':
+        return _mentions(ref[1], paths, names)
+    elif kind == 'multi':
+        return any(_mentions(r, paths, names) for r in ref[1])
+    elif kind == 'closure':
+        return (any(_mentions(r, paths, names) for r in ref[1])
+                or _mentions(ref[2], paths, names))
+    return False
+
 class Library(ctypes.CDLL):
     def __init__(self, *args, **kwargs):
+        index_cache_dir = kwargs.pop('index_cache_dir', None)
         ctypes.CDLL.__init__(self, *args, **kwargs)
-        self.types = types.Types(self)
+        #: symbol name -> foreign function (None if missing), see `__getitem__`.
+        #: Has to be there before anything is looked up.
+        self._symbols = {}
+        self.symbol_cache_stats = {'hits': 0, 'misses': 0}
+        #: The exported symbols, see `pyooc.ffi.elf`. None if the library
+        #: file couldn't be read.
+        self.symbol_index = None
+        if self._name:
+            self.symbol_index = elf.load_index(self._name, index_cache_dir)
+        #: argtype -> converter, see `Module.get_converter`.
+        self._converters = {}
         #: We're storing the class pointer -> pyooc class connection here.
         self._classes = {}
+        #: pyooc class -> its ooc class pointer, see `KindOfClass.class_`.
+        self._class_pointers = {}
+        #: pyooc class -> metadata of its ooc class, see `get_class_info`.
+        self._class_info = {}
         self._module_cache = {}
+        #: type reference -> type, see `pyooc.bind.plan.get_type`.
+        self._type_cache = {}
+        self.type_cache_stats = {'hits': 0, 'misses': 0}
+        #: paths of the modules `pyooc.bind` declared the types of / bound.
+        self._declared_modules = set()
+        self._bound_modules = set()
+
+        self.types = types.Types(self)
+        #: Python type -> converter, see `Module.convert_to_ctypes`.
+        self._python_converters = {
+            type(None): lambda value: self.types.Pointer(),
+            int: self.types.Int,
+            long: self.types.Long, # TODO: unsigned?
+            str: self.types.String.make,
+        }
 
         self.types.setup()
 
+    def __getitem__(self, name):
+        """
+            Return the foreign function *name*. The symbol is only looked
+            up once, the same function object (with its `restype` and
+            `argtypes`) is returned every time. Raise AttributeError if
+            there's no such symbol.
+        """
+        try:
+            func = self._symbols[name]
+        except KeyError:
+            self.symbol_cache_stats['misses'] += 1
+            try:
+                func = self._dlsym(name)
+            except AttributeError:
+                func = None
+            self._symbols[name] = func
+        else:
+            self.symbol_cache_stats['hits'] += 1
+        if func is None:
+            raise AttributeError('%s: undefined symbol: %s' % (self._name, name))
+        return func
+
+    def _dlsym(self, name):
+        with timing.phase('dlsym'):
+            return ctypes.CDLL.__getitem__(self, name)
+
+    def new_function(self, name):
+        """
+            Return a new foreign function object for the symbol *name*.
+            The symbol is looked up once like for `__getitem__`, but the
+            function object isn't shared, so its `restype` and `argtypes`
+            can be set without affecting anybody else.
+        """
+        return self._FuncPtr(ctypes.cast(self[name], ctypes.c_void_p).value)
+
+    def has_symbol(self, name):
+        """
+            Return True if the library exports the symbol *name*. Uses the
+            symbol index if there is one, so it doesn't need `dlsym`.
+        """
+        if self.symbol_index is not None:
+            return name in self.symbol_index
+        try:
+            self[name]
+        except AttributeError:
+            return False
+        return True
+
     def get_module(self, path, autoload=True):
         # TODO: respect autoload?
         if path not in self._module_cache:
             self._module_cache[path] = Module(self, path, autoload)
         return self._module_cache[path]
 
+    def invalidate_type_cache(self, paths=None, names=None):
+        """
+            Drop the cached types of the type references (see
+            `pyooc.bind.plan`) mentioning one of the modules *paths* or
+            one of the type names *names*. Drop all of them if neither
+            is given.
+        """
+        if paths is None and names is None:
+            self._type_cache.clear()
+            return
+        paths = frozenset(paths or ())
+        names = frozenset(names or ())
+        for ref in self._type_cache.keys():
+            if _mentions(ref, paths, names):
+                del self._type_cache[ref]
+
     def _add_class_type(self, ooc, py):
         address = ctypes.addressof(ooc.contents)
         self._classes[address] = py
 
     def _get_class_type(self, ooc):
         address = ctypes.addressof(ooc.contents)
-        return self._classes[address]
+        try:
+            return self._classes[address]
+        except KeyError:
+            # Maybe it's a class that is still waiting to be bound lazily.
+            if not self.bind_lazy_class(address):
+                raise
+            return self._classes[address]
+
+    def get_class_info(self, cls):
+        """
+            Return a dictionary with the metadata of the ooc class of the
+            pyooc class *cls*: its ``name``, ``instanceSize``, ``size``
+            and ``super`` (the class pointer of its super class, None if
+            there is none). It's read only once.
+        """
+        try:
+            return self._class_info[cls]
+        except KeyError:
+            pass
+        contents = self._get_class_struct(cls.class_())
+        value = lambda v: getattr(v, 'value', v)
+        super_ = contents.super
+        info = {
+            'name': value(contents.name),
+            'instanceSize': value(contents.instanceSize),
+            'size': value(contents.size),
+            'super': super_ if super_ else None,
+        }
+        self._class_info[cls] = info
+        return info
+
+    def _get_class_struct(self, class_):
+        # The fields of `ClassStruct` aren't reachable through the structs
+        # of metaclasses (their `__super__`s clash), so cast.
+        return ctypes.cast(class_, ctypes.POINTER(self.types.Class._struct)).contents
+
+    def invalidate_class_cache(self):
+        """
+            Forget the cached class pointers and metadata, and which
+            class pointer belongs to which pyooc class. They're only
+            outdated if the library was reloaded.
+        """
+        self._class_pointers.clear()
+        self._class_info.clear()
+        self._classes.clear()
+
+    def bind_lazy_class(self, address):
+        """
+            Bind the class or cover whose ooc class is at *address* if it's
+            still waiting to be bound lazily. The others stay lazy. Return
+            True if there was one.
+        """
+        for module in self._module_cache.values():
+            for name in module._lazy_members.keys():
+                if (name in module._declared
+                    and module._get_class_address(name) == address):
+                    module.bind_lazy_member(name)
+                    return True
+        return False
+
+    def bind_lazy_classes(self):
+        """
+            Bind all classes of all modules that are still waiting to be
+            bound lazily. Return True if there were any.
+        """
+        found = False
+        for module in self._module_cache.values():
+            for name in module._lazy_members.keys():
+                if name in module._declared:
+                    found = True
+                    module.bind_lazy_member(name)
+        return found
 
 class Module(object):
     def __init__(self, library, path, autoload=True):
         self.library = library
         self.path = path
+        #: name -> class or cover declared in this module, bound or not.
+        self._declared = {}
+        #: name -> callable binding the member on first access.
+        self._lazy_members = {}
         self.member_prefix = re.sub(r'[^a-zA-Z0-9_]', '_', path) + '__'
         if re.match(r'^[^a-zA-Z0-9_]', self.member_prefix):
             self.member_prefix = '_' + self.member_prefix
@@ -100,15 +297,154 @@ class Module(object):
         load()
 
     def __getattr__(self, key):
+        if key in self.__dict__.get('_lazy_members', ()):
+            self.bind_lazy_member(key)
+            return getattr(self, key)
         return self[key]
 
+    def declare_type(self, name, cls):
+        """
+            Add the (maybe not yet bound) class or cover *cls* as *name*.
+        """
+        self._declared[name] = cls
+        setattr(self, name, cls)
+
+    def get_type(self, name):
+        """
+            Return the member *name* like `getattr` does, but don't bind
+            lazy members: declared classes are returned as they are.
+            Return None if there's no member *name*.
+        """
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            pass
+        if name in self._declared:
+            return self._declared[name]
+        try:
+            return self[name]
+        except AttributeError:
+            return None
+
+    def add_lazy_member(self, name, binder):
+        """
+            Make *binder* bind the member *name* the first time it is
+            accessed. If *name* is a declared class, accessing one of its
+            instances' attributes also binds it.
+        """
+        self.__dict__.pop(name, None)
+        self._lazy_members[name] = binder
+        if name in self._declared:
+            self._declared[name]._binder_ = partial(self.bind_lazy_member, name)
+
+    def bind_lazy_member(self, name):
+        """
+            Bind the lazy member *name* now. If that fails, it stays lazy,
+            so the next access tries again.
+        """
+        binder = self._lazy_members[name]
+        cls = self._declared.get(name)
+        if cls is not None:
+            cls._binder_ = None
+            setattr(self, name, cls)
+        try:
+            binder()
+        except:
+            if cls is not None:
+                cls._binder_ = partial(self.bind_lazy_member, name)
+                self.__dict__.pop(name, None)
+            raise
+        del self._lazy_members[name]
+
+    def _get_class_address(self, name):
+        """
+            Return the address of the ooc class of the declared class or
+            cover *name* without binding it, or None if the library has
+            no class function for it.
+        """
+        try:
+            func = self.new_function(self._declared[name]._get_name('class'))
+        except AttributeError:
+            return None
+        func.restype = ctypes.c_void_p
+        return func()
+
+    def reset(self):
+        """
+            Forget the declared classes and all bound and lazy members, so
+            the module can be declared and bound again. Classes that are
+            still referenced elsewhere are stale afterwards.
+        """
+        library = self.library
+        stale = set()
+        for cls in self._declared.itervalues():
+            stale.add(cls)
+            if cls._meta is not None:
+                stale.add(cls._meta)
+        for cls in stale:
+            library._class_pointers.pop(cls, None)
+            library._class_info.pop(cls, None)
+        for address, cls in library._classes.items():
+            if cls in stale:
+                del library._classes[address]
+        for name in self.__dict__.keys():
+            if name not in ('library', 'path', 'member_prefix'):
+                del self.__dict__[name]
+        self._declared = {}
+        self._lazy_members = {}
+
     def __getitem__(self, key):
         return self.library[self.member_prefix + key]
 
+    def new_function(self, key):
+        """
+            Return a new foreign function object for the member *key*, see
+            `Library.new_function`. Wrappers configure their own.
+        """
+        return self.library.new_function(self.member_prefix + key)
+
+    def _get_symbol_index(self):
+        # Only trust the index for modules in the library itself, the
+        # others may live in a library it links to.
+        index = self.library.symbol_index
+        if index is not None and index.has_module(self.member_prefix):
+            return index
+        return None
+
+    def has_member(self, name):
+        """
+            Return False if the symbol index of the library says there's no
+            symbol for the member *name*. Return True if there is one, or
+            if there is no index for this module.
+        """
+        index = self._get_symbol_index()
+        if index is None:
+            return True
+        return (self.member_prefix + name) in index
+
+    def missing_members(self, names):
+        """
+            Return the names of *names* `has_member` returns False for.
+        """
+        return [name for name in names if not self.has_member(name)]
+
+    def list_members(self):
+        """
+            Return the sorted names of the exported members of this module,
+            or None if the library has no symbol index for it.
+        """
+        index = self._get_symbol_index()
+        if index is None:
+            return None
+        return index.members(self.member_prefix)
+
     def convert_arguments(self, args):
         return map(self.convert_to_ctypes, args)
 
     def convert_to_ctypes(self, value):
+        converter = self.library._python_converters.get(type(value))
+        if converter is not None:
+            return converter(value)
         if value is None:
             return self.library.types.Pointer()
         elif isinstance(value, (Class, Cover)):
@@ -128,12 +464,51 @@ class Module(object):
         else:
             raise BindingError("No idea how to convert %r" % value)
 
+    def get_converter(self, argtype):
+        """
+            Return a function converting a value to an argument of the type
+            *argtype*, like `convert_to_ctypes`. Values already having the
+            right type are passed as they are.
+        """
+        converters = self.library._converters
+        try:
+            return converters[argtype]
+        except KeyError:
+            pass
+        convert = self.convert_to_ctypes
+        if not isinstance(argtype, type):
+            # generic typenames.
+            converter = convert
+        else:
+            direct = set([argtype])
+            if (issubclass(argtype, ctypes._SimpleCData)
+                and argtype._type_ in INTEGER_CODES):
+                direct.update((int, long, bool))
+            direct = frozenset(direct)
+            if getattr(argtype, '_functype_', None) is not None:
+                # typed closures take other closures and Python callables, too.
+                coerce = argtype.coerce
+                def converter(value):
+                    if value.__class__ in direct:
+                        return value
+                    value = coerce(value)
+                    if value.__class__ in direct:
+                        return value
+                    return convert(value)
+            else:
+                def converter(value):
+                    if value.__class__ in direct:
+                        return value
+                    return convert(value)
+        converters[argtype] = converter
+        return converter
+
     def add_operator(self, op, restype, argtypes, add_operator=True, member=None):
         # get the ooc function name
         ooc_op, py_special_name = OPERATORS[op]
         ooc_name = '__OP_%s_%s' % (ooc_op, '_'.join(a._name_ for a in argtypes))
         # get the operator function
-        func = self[ooc_name]
+        func = self.new_function(ooc_name)
         func.restype = restype
         # add the function as member if wished
         # return `self` if the function has no return type given
@@ -158,6 +533,7 @@ class Module(object):
         """
             Create a wrapper for a generic function. That can also be used for non-generic
             or generic multi-return functions. Didn't want too much code duplication, you know.
+            The wrapper is specialized for the signature.
         """
         multi_return = isinstance(restype, tuple)
         # `additional_generictypes` are generic typenames that don't get passed.
@@ -173,7 +549,7 @@ class Module(object):
             return_generic = False
             multi_return_generic = True
         # get the method
-        func = self[name]
+        func = self.new_function(name)
         # now construct the argument list.
         pass_argtypes = []
         # if it's a method, the this pointer is the very first argument.
@@ -210,91 +586,118 @@ class Module(object):
         # same for multi-return functions.
         if not (return_generic or multi_return):
             func.restype = restype
-        # Now, we'll construct a function. It's not very nice,
-        # I'd rather like to generate code, but that would
-        # be evil, I think. TODO: nicer nicer nicer!
-        def function(*args, **kwargs):
-            pass_args = []
-            # if it's a method, the first argument is
-            # the this pointer.
+        # Build a wrapper doing only what this signature needs.
+        converters = [self.get_converter(argtype) for argtype in argtypes]
+        nargs = len(argtypes)
+        all_generictypes = frozenset(generictypes) | frozenset(additional_generictypes)
+        generic_positions = [idx for idx, argtype in enumerate(argtypes)
+                             if argtype in all_generictypes]
+        if not (multi_return or return_generic or generictypes or generic_positions):
+            # Plain function: just convert the arguments.
             if method:
-                pass_args.append(args[0])
-                args = args[1:]
-            generictypes_types = {}
-            if multi_return:
-                multi_return_values = []
-                # Multiple, partly generic return types.
-                for ridx, rtype in enumerate(restype):
-                    if (rtype in generictypes or rtype in additional_generictypes):
-                        # Generic, yes.
-                        if (method and rtype in additional_generictypes):
-                            # See above.
-                            restype_ = getattr(pass_args[0].contents, rtype)
-                            result = self.library._get_class_type(restype_)()
-                        else:
-                            restype_ = kwargs.pop('restype%d' % ridx)
-                            assert restype_ # TODO: COOL error
-                            result = restype_()
-                            if rtype not in generictypes_types:
-                                generictypes_types[rtype] = restype_.class_()
-                        pass_args.append(ctypes.cast(
-                            ctypes.pointer(ctypes.pointer(result)),
-                            ctypes.POINTER(ctypes.POINTER(self.library.types.Octet))
-                            ))
-                    else:
-                        # Ordinary.
-                        result = rtype()
-                        pass_args.append(ctypes.pointer(result))
-                    multi_return_values.append(result)
-                assert not kwargs
-            # if the return value is generic or, the user has to pass the type explicitly.
-            if return_generic:
-                restype_ = None
-                if (method and restype in additional_generictypes):
-                    # Yay generic type restype AND a method AND class-wide
-                    # generic type. TODO: BAH EVILNESS
-                    restype_ = getattr(pass_args[0].contents, restype)
-                    # allocate some memory for dinner
-                    result = self.library._get_class_type(restype_)()
-                else:
+                def function(this, *args):
+                    return func(this, *[convert(arg) for convert, arg in zip(converters, args)])
+            else:
+                def function(*args):
+                    return func(*[convert(arg) for convert, arg in zip(converters, args)])
+            return function
+        # Generic values are passed with `byref` instead of casted
+        # pointers, that's a lot cheaper. So they are void pointers now.
+        pass_argtypes = list(func.argtypes)
+        offset = len(pass_argtypes) - nargs
+        for idx in generic_positions:
+            pass_argtypes[offset + idx] = ctypes.c_void_p
+        if multi_return:
+            for ridx, rtype in enumerate(restype):
+                if rtype in all_generictypes:
+                    pass_argtypes[ridx + (1 if method else 0)] = ctypes.c_void_p
+        func.argtypes = pass_argtypes
+        byref = ctypes.byref
+        pointer = ctypes.pointer
+        def convert_args(args, classes):
+            # Convert the arguments, pass generic ones by reference, and
+            # find the classes of the generic types that aren't known yet.
+            args = [convert(arg) for convert, arg in zip(converters, args)]
+            for idx in generic_positions:
+                arg = args[idx]
+                argtype = argtypes[idx]
+                if argtype not in classes:
+                    classes[argtype] = arg.class_()
+                args[idx] = byref(arg)
+            if generictypes:
+                return [classes[gtype] for gtype in generictypes] + args
+            return args
+        if not (multi_return or return_generic):
+            # Generic arguments only.
+            if method:
+                def function(this, *args):
+                    return func(this, *convert_args(args, {}))
+            else:
+                def function(*args):
+                    return func(*convert_args(args, {}))
+            return function
+        if return_generic:
+            if method and restype in additional_generictypes:
+                # The class-wide generic type is stored in the instance.
+                get_class_type = self.library._get_class_type
+                def function(this, *args):
+                    result = get_class_type(getattr(this.contents, restype))()
+                    func(this, byref(result), *convert_args(args, {}))
+                    return result
+            else:
+                def make_result(kwargs):
                     restype_ = kwargs.pop('restype')
                     assert not kwargs
                     assert restype_ # TODO: nice error
-                    result = restype_()
-                    # TODO: Since we have to pass the result type anyway, we could work around
-                    # the rock limitation that you have to pass the class explicitly if you have
-                    # a function with a generic return value (ie. `a: func <T> (T: Class) -> T`). Hmmm?
-                pass_args.append(ctypes.pointer(result))
-            regular_args = []
-            for argtype, arg in zip(argtypes, args):
-                # is it generic?
-                arg = self.convert_to_ctypes(arg)
-                if (argtype in generictypes or argtype in additional_generictypes):
-                    # yes. pass a pointer.
-                    regular_args.append(
-                            ctypes.cast(
-                                ctypes.pointer(arg),
-                                ctypes.POINTER(
-                                    self.library.types.Octet
-                                    )
-                                ))
-                    if argtype not in generictypes_types:
-                        generictypes_types[argtype] = arg.class_()
+                    return restype_()
+                if method:
+                    def function(this, *args, **kwargs):
+                        result = make_result(kwargs)
+                        func(this, byref(result), *convert_args(args, {}))
+                        return result
                 else:
-                    # no. just pass the argument.
-                    regular_args.append(arg)
-            for gtype in generictypes:
-                pass_args.append(generictypes_types[gtype])
-            pass_args.extend(regular_args)
-            # and now ... call it!
-            if return_generic:
-                func(*pass_args)
-                return result
-            elif multi_return:
-                func(*pass_args)
-                return tuple(multi_return_values)
+                    def function(*args, **kwargs):
+                        result = make_result(kwargs)
+                        func(byref(result), *convert_args(args, {}))
+                        return result
+            return function
+        # Multi-return: pointers to the return values come first.
+        rtypes = []
+        for ridx, rtype in enumerate(restype):
+            if (method and rtype in additional_generictypes):
+                rtypes.append((rtype, 'instance'))
+            elif rtype in all_generictypes:
+                rtypes.append((rtype, 'restype%d' % ridx))
             else:
-                return func(*pass_args)
+                rtypes.append((rtype, None))
+        def function(*args, **kwargs):
+            pass_args = []
+            if method:
+                pass_args.append(args[0])
+                args = args[1:]
+            classes = {}
+            results = []
+            for rtype, source in rtypes:
+                if source is None:
+                    # Ordinary.
+                    result = rtype()
+                    pass_args.append(byref(result))
+                else:
+                    if source == 'instance':
+                        restype_ = getattr(pass_args[0].contents, rtype)
+                        result = self.library._get_class_type(restype_)()
+                    else:
+                        restype_ = kwargs.pop(source)
+                        assert restype_ # TODO: COOL error
+                        result = restype_()
+                        if rtype not in classes:
+                            classes[rtype] = restype_.class_()
+                    pass_args.append(byref(pointer(result)))
+                results.append(result)
+            assert not kwargs
+            pass_args.extend(convert_args(args, classes))
+            func(*pass_args)
+            return tuple(results)
         return function
 
 class KindOfClass(object):
@@ -308,13 +711,53 @@ class KindOfClass(object):
     _extends_ = None
     _meta = None
     _is_meta = None
+    #: Set if the class is bound lazily and wasn't bound yet.
+    _binder_ = None
+
+    def __getattr__(self, name):
+        # Something accessed a (probably) bound attribute of an instance
+        # of a class that's waiting to be bound lazily. Bind it now.
+        binder = type(self).__dict__.get('_binder_')
+        if binder is None or name.startswith('_'):
+            raise AttributeError(name)
+        binder()
+        return getattr(self, name)
 
     @classmethod
     def class_(cls):
         """
-            oh yay, return my class
+            oh yay, return my class. It's cached in the library.
+        """
+        pointers = cls._module.library._class_pointers
+        try:
+            return pointers[cls]
+        except KeyError:
+            class_ = pointers[cls] = cls._load_class()
+            return class_
+
+    @classmethod
+    def _load_class(cls):
+        with timing.phase('class_'):
+            return cls._static_method('class', cls._meta)()
+
+    @classmethod
+    def declare(cls, name, fields=None, static_fields=None, methods=None,
+                extends=None, generictypes=None):
+        """
+            Describe the class for `setup`: its ooc name, its fields and
+            static fields, its methods (`Func` instances), the class it
+            extends and its generic types.
         """
-        return cls._static_method('class', cls._meta)()
+        cls._name_ = name
+        cls._static_fields_ = static_fields
+        cls._methods_ = methods
+        cls._extends_ = extends
+        cls._generictypes_ = generictypes
+        cls._declare_fields(fields)
+
+    @classmethod
+    def _declare_fields(cls, fields):
+        cls._fields_ = fields
 
     @classmethod
     def bind(cls, module, autosetup=True):
@@ -326,12 +769,13 @@ class KindOfClass(object):
     @classmethod
     def setup(cls):
         if cls._struct is None:
-            if cls._generictypes_ is None:
-                cls._generictypes_ = ()
-            if (not cls._is_meta and cls._meta is None):
-                cls._create_meta()
-                cls._meta.setup()
-            cls._setup()
+            with timing.phase('setup'):
+                if cls._generictypes_ is None:
+                    cls._generictypes_ = ()
+                if (not cls._is_meta and cls._meta is None):
+                    cls._create_meta()
+                    cls._meta.setup()
+                cls._setup()
 
     @classmethod
     def _get_name(cls, name):
@@ -373,7 +817,7 @@ class KindOfClass(object):
         if cls._module is None:
             raise BindingError("You have to bind the class to a library!")
         name = cls._get_name(name)
-        func = cls._module[name]
+        func = cls._module.new_function(name)
         if restype is not None:
             if (restype in cls._generictypes_ or isinstance(restype, tuple)):
                 # Generic or multi-return function.
@@ -388,16 +832,14 @@ class KindOfClass(object):
                 func.argtypes = [ctypes.POINTER(None)] + argtypes
         else:
             func.argtypes = [ctypes.POINTER(None)]
-        def call(*args):
-            return func(*cls._module.convert_arguments(args))
-        return call
+        return cls._make_call(func, func.argtypes)
 
     @classmethod
     def _static_method(cls, name, restype=None, argtypes=None):
         if cls._module is None:
             raise BindingError("You have to bind the class to a library!")
         name = cls._get_name(name)
-        func = cls._module[name]
+        func = cls._module.new_function(name)
         if restype is not None:
             if (restype in cls._generictypes_ or isinstance(restype, tuple)):
                 # Generic or multi-return function.
@@ -410,8 +852,25 @@ class KindOfClass(object):
                 return cls._module.generic_function(name, (), restype, argtypes, False, cls._generictypes_)
             else:
                 func.argtypes = argtypes
+        return cls._make_call(func, argtypes)
+
+    @classmethod
+    def _make_call(cls, func, argtypes):
+        """
+            Return a function converting its arguments for *func*, using
+            converters for *argtypes* if they're known.
+        """
+        convert_arguments = cls._module.convert_arguments
+        if argtypes is None:
+            def call(*args):
+                return func(*convert_arguments(args))
+            return call
+        converters = [cls._module.get_converter(argtype) for argtype in argtypes]
+        nargs = len(converters)
         def call(*args):
-            return func(*cls._module.convert_arguments(args))
+            if len(args) != nargs:
+                return func(*convert_arguments(args))
+            return func(*[convert(arg) for convert, arg in zip(converters, args)])
         return call
 
     @classmethod
@@ -514,7 +973,7 @@ class Class(KindOfClass, ctypes.c_void_p):
                 getter = None
                 setter = None
                 if getter_name:
-                    getter = cls._module.library[getter_name]
+                    getter = cls._module.library.new_function(getter_name)
                     getter.restype = argtype
                     if cls._is_meta: # they're static!
                         getter.argtypes = []
@@ -524,7 +983,7 @@ class Class(KindOfClass, ctypes.c_void_p):
                         # `X` should be `this`, not `XStruct`.
                         getter = lambda self, g=getter: g(ctypes.byref(self))
                 if setter_name:
-                    setter = cls._module.library[setter_name]
+                    setter = cls._module.library.new_function(setter_name)
                     if cls._is_meta: # it's static.
                         setter.argtypes = [argtype]
                         setter = lambda self, value, s=setter: s(cls._module.convert_to_ctypes(value))
@@ -541,7 +1000,10 @@ class Class(KindOfClass, ctypes.c_void_p):
             if client._methods_:
                 for func in client._methods_:
                     # Let's add it to the Python class ...
-                    if func.static:
+                    if not client._module.has_member(client._get_name(func.name)):
+                        # not exported, ooc didn't generate it or it's inline.
+                        pass
+                    elif func.static:
                         if func.generictypes:
                             client._add_generic_static_method(func.name, func.generictypes, func.restype, func.argtypes)
                         else:
@@ -567,22 +1029,83 @@ class Class(KindOfClass, ctypes.c_void_p):
             cls._module.library._add_class_type(cls.class_(), cls)
 
 class Cover(KindOfClass):
+    @classmethod
+    def _declare_fields(cls, fields):
+        if fields is None or not issubclass(cls, ctypes.Structure):
+            cls._fields_ = fields
+        elif '_fields_' not in cls.__dict__:
+            # properties (rows with getter and setter names) aren't laid out.
+            cls.lay_out([row for row in fields if len(row) == 2], cls._extends_)
+
+    @classmethod
+    def lay_out(cls, fields, extends=None):
+        """
+            Lay out a struct cover, so it can be embedded in other structs
+            and arrays: the fields of the struct cover *extends* come first
+            (`__bases__` of structures can't be changed, so they're copied),
+            then the ``(name, type)`` tuples *fields*. It's done once, before
+            the cover is used in other structs; `declare` keeps the layout.
+        """
+        layout = []
+        if extends is not None and issubclass(extends, ctypes.Structure):
+            if '_fields_' not in extends.__dict__:
+                raise BindingError("%r has to be laid out before %r" % (extends, cls))
+            layout.extend(extends._fields_)
+        for name, argtype in fields:
+            if isinstance(argtype, basestring):
+                # generic.
+                argtype = ctypes.POINTER(ctypes.c_uint8)
+            elif (isinstance(argtype, type) and issubclass(argtype, Cover)
+                  and issubclass(argtype, ctypes.Structure)
+                  and '_fields_' not in argtype.__dict__):
+                # embedding it would make its empty layout final.
+                raise BindingError("%r has to be laid out before %r" % (argtype, cls))
+            layout.append((name, argtype))
+        cls._fields_ = layout
+
     @classmethod
     def _setup(cls):
         if cls._name_ is None:
             cls._name_ = cls.__name__
         if cls._fields_ is None:
             cls._fields_ = []
-        bases = (ctypes.Structure,)
-        if cls._extends_ is not None:
-            bases = (cls._extends_._struct,)
-            cls.__bases__ = (cls._extends,)
-        struct = type(cls.__name__ + 'Struct', bases, {
-            '_fields_': cls._fields_,
-        })
-        cls._struct = struct
+        if issubclass(cls, ctypes.Structure):
+            # laid out already, see `_declare_fields`.
+            cls._struct = cls
+        else:
+            bases = (ctypes.Structure,)
+            if cls._extends_ is not None:
+                cls._extends_.setup()
+                bases = (cls._extends_._struct,)
+                try:
+                    cls.__bases__ = (cls._extends_,)
+                except TypeError:
+                    # covers from different C types.
+                    pass
+            struct = type(cls.__name__ + 'Struct', bases, {
+                '_fields_': cls._fields_,
+            })
+            cls._struct = struct
         # connect the ooc class to the python class
-        cls._module.library._add_class_type(cls.class_(), cls)
+        class_ = cls.class_()
+        cls._module.library._add_class_type(class_, cls)
+        if issubclass(cls, ctypes.Structure) and cls._fields_:
+            cls.check_layout(class_)
+
+    @classmethod
+    def check_layout(cls, class_=None):
+        """
+            Raise a `BindingError` if the size of the cover isn't the size
+            its class (*class_*, by default `class_()`) reports.
+        """
+        if class_ is None:
+            class_ = cls.class_()
+        size = cls._module.library._get_class_struct(class_).size
+        size = getattr(size, 'value', size)
+        if size != ctypes.sizeof(cls):
+            raise BindingError('%r has %d bytes, but its C type has %d' % (
+                cls, ctypes.sizeof(cls), size))
 
 # We import it here because types.py needs Cover.
 from . import types
+from . import elf
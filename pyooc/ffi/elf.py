@@ -0,0 +1,245 @@
+"""
+    Reading the exported symbols of an ELF shared object without loading
+    it, see `read_index`. `pyooc.ffi.Library` uses that to know which
+    symbols exist without any ``dlsym`` calls::
+
+        index = load_index('libfoo.so', cache_dir='/tmp/symbols')
+        print index.members('lang_String__')
+        print index.classes('lang_String__')['String']
+
+    Indices can be cached on disk, keyed by the build-id of the shared
+    object (see `load_index`).
+"""
+import os
+import struct
+import cPickle as pickle
+
+from pyooc.files import makedirs, atomic_write
+
+class ELFError(Exception):
+    pass
+
+#: Increase this if the layout of cached indices changes.
+INDEX_VERSION = 1
+
+SHT_NOTE = 7
+SHT_DYNSYM = 11
+SHN_UNDEF = 0
+STB_GLOBAL = 1
+STB_WEAK = 2
+STB_GNU_UNIQUE = 10
+STT_OBJECT = 1
+STT_FUNC = 2
+STV_HIDDEN = 2
+STV_INTERNAL = 1
+NT_GNU_BUILD_ID = 3
+
+#: ELF class -> (header, section header, symbol) struct formats.
+FORMATS = {
+    1: ('HHIIIIIHHHHHH', 'IIIIIIIIII', 'IIIBBH'),
+    2: ('HHIQQQIHHHHHH', 'IIQQQQIIQQ', 'IBBHQQ'),
+}
+
+class SymbolIndex(object):
+    """
+        The symbols exported by a shared object. Members are grouped by
+        the module prefix of their names (see `pyooc.ffi.Module.member_prefix`),
+        and by class inside a module.
+    """
+    def __init__(self, symbols, build_id=None):
+        #: symbol name -> 'function', 'object' or 'other'
+        self.symbols = symbols
+        self.build_id = build_id
+        #: module prefix -> set of member names
+        self._modules = {}
+        for name in symbols:
+            idx = name.find('__', 1)
+            if idx == -1 or idx + 2 == len(name):
+                continue
+            self._modules.setdefault(name[:idx + 2], set()).add(name[idx + 2:])
+        #: module prefix -> {class name: member names}, filled on demand.
+        self._classes = {}
+
+    def __contains__(self, name):
+        return name in self.symbols
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def has_module(self, prefix):
+        """
+            True if there are symbols with the module prefix *prefix*.
+        """
+        return prefix in self._modules
+
+    def members(self, prefix):
+        """
+            Return the sorted names of the members of the module with the
+            prefix *prefix*, without the prefix.
+        """
+        return sorted(self._modules.get(prefix, ()))
+
+    def classes(self, prefix):
+        """
+            Return a dictionary mapping the names of the classes and covers
+            of the module with the prefix *prefix* to the sorted names of
+            their members (``class``, ``new``, ...). A class is recognized
+            by its ``<Class>_class`` function.
+        """
+        try:
+            return self._classes[prefix]
+        except KeyError:
+            pass
+        members = self._modules.get(prefix, ())
+        names = [member[:-len('_class')] for member in members
+                 if member.endswith('_class') and len(member) > len('_class')]
+        # longest first, so `Foo_Bar_x` goes to `Foo_Bar` rather than `Foo`.
+        names.sort(key=len, reverse=True)
+        classes = dict((name, []) for name in names)
+        for member in members:
+            for name in names:
+                if member.startswith(name + '_'):
+                    classes[name].append(member[len(name) + 1:])
+                    break
+        for class_members in classes.itervalues():
+            class_members.sort()
+        self._classes[prefix] = classes
+        return classes
+
+def _read(f, offset, size):
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) != size:
+        raise ELFError('Truncated file')
+    return data
+
+def _read_sections(f):
+    """
+        Return ``(endian, elf_class, sections)`` with a list of
+        ``(type, offset, size, link, entsize)`` tuples for the sections
+        of the ELF file *f*.
+    """
+    ident = _read(f, 0, 16)
+    if ident[:4] != '\x7fELF':
+        raise ELFError('Not an ELF file')
+    elf_class = ord(ident[4])
+    if elf_class not in FORMATS:
+        raise ELFError('Unknown ELF class %d' % elf_class)
+    endian = {1: '<', 2: '>'}.get(ord(ident[5]))
+    if endian is None:
+        raise ELFError('Unknown ELF data encoding %d' % ord(ident[5]))
+    header_format, section_format, _ = FORMATS[elf_class]
+    header_format = endian + header_format
+    header = struct.unpack(header_format, _read(f, 16, struct.calcsize(header_format)))
+    shoff, shentsize, shnum = header[5], header[10], header[11]
+    if not shoff or not shnum:
+        raise ELFError('No section headers')
+    section_format = endian + section_format
+    size = struct.calcsize(section_format)
+    if shentsize < size:
+        raise ELFError('Bad section header size %d' % shentsize)
+    data = _read(f, shoff, shentsize * shnum)
+    sections = []
+    for idx in xrange(shnum):
+        (_, type, _, _, offset, size_, link, _, _, entsize) = struct.unpack(
+            section_format, data[idx * shentsize:idx * shentsize + size])
+        sections.append((type, offset, size_, link, entsize))
+    return endian, elf_class, sections
+
+def _read_build_id(f, endian, sections):
+    for type, offset, size, link, entsize in sections:
+        if type != SHT_NOTE:
+            continue
+        data = _read(f, offset, size)
+        pos = 0
+        while pos + 12 <= len(data):
+            namesz, descsz, note_type = struct.unpack(endian + 'III', data[pos:pos + 12])
+            pos += 12
+            name = data[pos:pos + namesz].rstrip('\0')
+            pos += (namesz + 3) & ~3
+            desc = data[pos:pos + descsz]
+            pos += (descsz + 3) & ~3
+            if name == 'GNU' and note_type == NT_GNU_BUILD_ID:
+                return desc.encode('hex')
+    return None
+
+def _read_symbols(f, endian, elf_class, sections):
+    symbol_format = endian + FORMATS[elf_class][2]
+    symbol_size = struct.calcsize(symbol_format)
+    symbols = {}
+    for type, offset, size, link, entsize in sections:
+        if type != SHT_DYNSYM:
+            continue
+        entsize = entsize or symbol_size
+        if link >= len(sections):
+            raise ELFError('Bad string table index %d' % link)
+        strings = _read(f, sections[link][1], sections[link][2])
+        data = _read(f, offset, size)
+        for pos in xrange(0, len(data) - symbol_size + 1, entsize):
+            fields = struct.unpack(symbol_format, data[pos:pos + symbol_size])
+            if elf_class == 2:
+                name_offset, info, other, shndx = fields[:4]
+            else:
+                name_offset, info, other, shndx = fields[0], fields[3], fields[4], fields[5]
+            if (shndx == SHN_UNDEF
+                or (info >> 4) not in (STB_GLOBAL, STB_WEAK, STB_GNU_UNIQUE)
+                or (other & 3) in (STV_HIDDEN, STV_INTERNAL)):
+                continue
+            end = strings.find('\0', name_offset)
+            name = strings[name_offset:end if end != -1 else len(strings)]
+            if name:
+                symbols[name] = {STT_FUNC: 'function', STT_OBJECT: 'object'}.get(info & 0xf, 'other')
+    return symbols
+
+def read_build_id(filename):
+    """
+        Return the GNU build-id of the ELF file *filename* as a hex
+        string, or None if it has none.
+    """
+    with open(filename, 'rb') as f:
+        endian, elf_class, sections = _read_sections(f)
+        return _read_build_id(f, endian, sections)
+
+def read_index(filename):
+    """
+        Read the dynamic symbol table of the ELF shared object *filename*
+        and return a `SymbolIndex` of the defined, visible symbols.
+        Raise `ELFError` if it's not an ELF file we can read.
+    """
+    with open(filename, 'rb') as f:
+        endian, elf_class, sections = _read_sections(f)
+        return SymbolIndex(_read_symbols(f, endian, elf_class, sections),
+                           _read_build_id(f, endian, sections))
+
+def load_index(filename, cache_dir=None):
+    """
+        Like `read_index`, but return None if *filename* can't be read.
+        If *cache_dir* is given, the index is cached there, in a file
+        named after the build-id; shared objects without a build-id
+        aren't cached.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            endian, elf_class, sections = _read_sections(f)
+            build_id = _read_build_id(f, endian, sections)
+            cache_filename = None
+            if cache_dir is not None and build_id is not None:
+                cache_filename = os.path.join(cache_dir, '%s.symbols' % build_id)
+                try:
+                    with open(cache_filename, 'rb') as cache:
+                        version, symbols = pickle.load(cache)
+                    if version == INDEX_VERSION:
+                        return SymbolIndex(symbols, build_id)
+                except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError):
+                    pass
+            index = SymbolIndex(_read_symbols(f, endian, elf_class, sections), build_id)
+    except (IOError, OSError, ELFError, struct.error):
+        return None
+    if cache_filename is not None:
+        try:
+            makedirs(cache_dir)
+            with atomic_write(cache_filename) as cache:
+                pickle.dump((INDEX_VERSION, index.symbols), cache, pickle.HIGHEST_PROTOCOL)
+        except (IOError, OSError):
+            pass
+    return index
@@ -1,6 +1,15 @@
 import ctypes
 
-from . import Cover, Module, Class as _Class, KindOfClass
+from . import Cover, Module, Class as _Class, KindOfClass, _CData
+
+#: The names of all types a `Types` instance has.
+TYPE_NAMES = frozenset([
+    'Char', 'UChar', 'WChar', 'Iterable', 'Buffer', 'String', 'Pointer',
+    'Int', 'UInt', 'Short', 'UShort', 'Long', 'ULong', 'LLong', 'ULLong',
+    'Float', 'Double', 'LDouble', 'Int8', 'Int16', 'Int32', 'Int64',
+    'UInt8', 'UInt16', 'UInt32', 'UInt64', 'Octet', 'Void', 'Bool', 'SizeT',
+    'Closure', 'Object', 'Class',
+])
 
 class Types(object):
     def __init__(self, lib):
@@ -141,6 +150,9 @@ class Types(object):
                 ('context', ctypes.c_void_p),
             ]
 
+            #: The prototype of the thunk of typed closures, see `get_closure_type`.
+            _functype_ = None
+
             @classmethod
             def from_func(cls, func, restype, argtypes):
                 def wrapper(*args):
@@ -148,12 +160,64 @@ class Types(object):
                     return func(*(args[:-1]))
                 argtypes = tuple(argtypes) + (ctypes.c_void_p,) # context pointer.
                 functype = ctypes.CFUNCTYPE(restype, *argtypes)
-                return Closure(
-                    thunk=ctypes.cast(functype(wrapper), ctypes.c_void_p),
+                callback = functype(wrapper)
+                closure = Closure(
+                    thunk=ctypes.cast(callback, ctypes.c_void_p),
                     context=None)
+                # the thunk is only valid as long as `callback` lives.
+                closure._callback = callback
+                return closure
+
+            @classmethod
+            def from_callable(cls, func):
+                """
+                    Return a closure of this typed closure type calling the
+                    Python callable *func*. Keep it as long as it may be called.
+                """
+                if isinstance(func, cls._functype_):
+                    callback = func
+                else:
+                    def callback(*args):
+                        return func(*(args[:-1])) # without the context pointer.
+                    callback = cls._functype_(callback)
+                closure = cls(thunk=ctypes.cast(callback, ctypes.c_void_p), context=None)
+                # the thunk is only valid as long as `callback` lives.
+                closure._callback = callback
+                return closure
+
+            @classmethod
+            def coerce(cls, obj):
+                """
+                    Return *obj* as a closure of this typed closure type if
+                    it's some other closure or a Python callable, otherwise
+                    return it as it is.
+
+                    Callables are converted by `from_callable` on each call,
+                    and the closure only lives as long as the call. If the
+                    C side keeps the closure, pass a `from_callable`
+                    closure and keep it yourself.
+                """
+                if cls._functype_ is None or isinstance(obj, cls):
+                    return obj
+                if isinstance(obj, Closure):
+                    # same struct, another type.
+                    closure = cls(thunk=obj.thunk, context=obj.context)
+                    # keep its callback alive, if it has one.
+                    closure._callback = obj
+                    return closure
+                if callable(obj) and (isinstance(obj, cls._functype_)
+                                      or not isinstance(obj, _CData)):
+                    return cls.from_callable(obj)
+                return obj
+
+            @classmethod
+            def from_param(cls, obj):
+                return type(cls).from_param(cls, cls.coerce(obj))
 
         self.Closure = Closure
         self.Closure.bind(types, False)
+        #: (restype, argtypes) -> typed closure type
+        self._closure_types = {}
 
         # METACLASS FUN
         class ObjectClassStruct(ctypes.Structure):
@@ -220,6 +284,24 @@ class Types(object):
         Object.bind(types, False)
         Class.bind(types, False)
 
+    def get_closure_type(self, restype, argtypes):
+        """
+            Return the subclass of `Closure` for closures taking arguments
+            of the types *argtypes* and returning *restype*. Wherever it's
+            an argument type, Python callables can be passed directly.
+            There's one such type per signature.
+        """
+        key = (restype, tuple(argtypes))
+        try:
+            return self._closure_types[key]
+        except KeyError:
+            pass
+        closure_type = type('Closure', (self.Closure,), {
+            '_functype_': ctypes.CFUNCTYPE(restype, *(key[1] + (ctypes.c_void_p,))), # context pointer.
+        })
+        self._closure_types[key] = closure_type
+        return closure_type
+
     def setup(self):
         self.Class.setup()
         self.Object.setup()
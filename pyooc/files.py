@@ -0,0 +1,45 @@
+"""
+    Helpers for the files pyooc writes: the module cache, symbol indices,
+    binding plans and the build cache.
+"""
+import os
+import sys
+import errno
+import thread
+from contextlib import contextmanager
+
+def makedirs(path):
+    """
+        Create the directory *path* and its parents, unless it exists.
+    """
+    try:
+        os.makedirs(path)
+    except OSError, e:
+        if e.errno != errno.EEXIST:
+            raise
+
+@contextmanager
+def atomic_write(filename):
+    """
+        Open a temporary file next to *filename* for writing (in binary
+        mode) and rename it to *filename* when the block is done, so
+        concurrent readers never see a half-written file. If the block
+        fails, the temporary file is removed::
+
+            with atomic_write(filename) as f:
+                f.write(data)
+    """
+    tmp_filename = '%s.%d.%d.tmp' % (filename, os.getpid(), thread.get_ident())
+    f = open(tmp_filename, 'wb')
+    try:
+        with f:
+            yield f
+        os.rename(tmp_filename, filename)
+    except:
+        # the OSError of `os.remove` would replace it.
+        exc_info = sys.exc_info()
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise exc_info[0], exc_info[1], exc_info[2]
@@ -1,4 +1,7 @@
 import os
+import gc
+import marshal
+import hashlib
 
 try:
     import simplejson as json
@@ -6,11 +9,37 @@ except ImportError:
     import json
 
 from odict import odict
+from pyooc import timing
+from pyooc.files import makedirs, atomic_write
 
 class ModuleNotFound(Exception):
     pass
 
+#: Bump this whenever the format of the module cache changes, so that
+#: stale module caches are ignored.
+CACHE_VERSION = 6
+
+#: All tags, modifiers and type names we read are stored only once.
+_strings = {}
+
+def intern_string(s):
+    """
+        Return the canonical instance of the string *s* (which may
+        also be a unicode string or None).
+    """
+    return _strings.setdefault(s, s)
+
+def intern_list(strings):
+    """
+        Return a new list of the canonical instances of *strings*.
+    """
+    return [_strings.setdefault(s, s) for s in strings]
+
 class Entity(object):
+    # Small entities exist in huge numbers, so they use slots. Subclasses
+    # that don't define `__slots__` get a `__dict__` as usual.
+    __slots__ = ('parent', 'doc')
+
     def __init__(self, parent):
         self.parent = parent
         self.doc = ''
@@ -35,7 +64,58 @@ class Entity(object):
             else:
                 return self.parent.resolve_name(name)
 
+class EntityStub(object):
+    """
+        Placeholder for an entity that wasn't read yet. It keeps the raw
+        JSON data around, `LazyMembers` builds the entity on first access.
+        The data is kept marshalled: decoded JSON takes several times
+        the memory of the entity built from it.
+    """
+    __slots__ = ('parent', 'cls', 'data')
+
+    def __init__(self, parent, cls, data):
+        self.parent = parent
+        self.cls = cls
+        self.data = marshal.dumps(data)
+
+    def build(self):
+        obj = self.cls(self.parent)
+        obj.read(marshal.loads(self.data))
+        return obj
+
+class LazyMembers(odict):
+    """
+        An odict whose values may be `EntityStub` instances. They are
+        replaced by the real entity the first time they are accessed.
+        Membership tests don't build anything. ``dict(members)`` and
+        ``f(**members)`` copy the storage, stubs included; use
+        ``dict(members.iteritems())``.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if type(value) is EntityStub:
+            value = value.build()
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def itervalues(self):
+        for key in self:
+            yield self[key]
+
+    def iteritems(self):
+        for key in self:
+            yield (key, self[key])
+
 class PropertyData(object):
+    __slots__ = ('has_getter', 'has_setter', 'full_getter_name', 'full_setter_name')
+
     def __init__(self):
         self.has_getter = False
         self.has_setter = False
@@ -45,8 +125,8 @@ class PropertyData(object):
     def read(self, data):
         self.has_getter = data['hasGetter']
         self.has_setter = data['hasSetter']
-        self.full_getter_name = data['fullGetterName']
-        self.full_setter_name = data['fullSetterName']
+        self.full_getter_name = intern_string(data['fullGetterName'])
+        self.full_setter_name = intern_string(data['fullSetterName'])
 
 class InterfaceImpl(Entity):
     def __init__(self, parent):
@@ -68,23 +148,27 @@ class Enum(Entity):
         self.name = data['name']
         self.increment_oper = data['incrementOper']
         self.increment_step = data['incrementStep']
-        self.elements = elements = odict()
+        elements = []
         for name, mdata in data['elements']:
             elem = EnumElement(self)
             elem.read(mdata)
-            elements[name] = elem
+            elements.append((name, elem))
+        self.elements = odict(elements)
 
 class EnumElement(Entity):
+    __slots__ = ('name', 'extern', 'value')
+
     def read(self, data):
-        self.doc = data['doc'] # empty string
-        self.name = data['name']
-        self.extern = data['extern']
+        self.doc = intern_string(data['doc']) # empty string
+        self.name = intern_string(data['name'])
+        self.extern = intern_string(data['extern'])
         self.value = data['value']
 
 class GlobalVariable(Entity):
+    __slots__ = ('name', 'modifiers', 'value', 'type', 'extern', 'property_data')
+
     def __init__(self, parent):
         Entity.__init__(self, parent)
-        self.parent = parent
         self.name = None
         self.modifiers = None
         self.value = None
@@ -93,17 +177,17 @@ class GlobalVariable(Entity):
         self.property_data = None
 
     def read(self, data):
-        self.name = data['name']
-        self.modifiers = data['modifiers']
+        self.name = intern_string(data['name'])
+        self.modifiers = intern_list(data['modifiers'])
         self.value = data['value']
-        self.type = data['varType']
-        self.extern = data['extern']
+        self.type = intern_string(data['varType'])
+        self.extern = intern_string(data['extern'])
         if data['propertyData']:
             self.property_data = PropertyData()
             self.property_data.read(data['propertyData'])
 
 class Field(GlobalVariable):
-    pass
+    __slots__ = ()
 
 class Classlike(Entity):
     def __init__(self, parent):
@@ -112,26 +196,38 @@ class Classlike(Entity):
 
     @property
     def ancestors(self):
-        ancestors = []
-        ancestor_name = self.extends
-        while ancestor_name:
-            ancestor = self.parent.resolve_type(ancestor_name)
-            ancestors.append(ancestor)
-            ancestor_name = ancestor.extends
-        return ancestors
+        return list(self.get_module().parent.get_class_hierarchy(self)[0])
 
     def __repr__(self):
         return '<%s object at 0x%x (%r)>' % (type(self).__name__, id(self), self.name)
 
     def read_members(self, members):
-        dispatch = {
-            'method': self.read_method,
-            'field': self.read_field,
+        if self.get_module().lazy:
+            self.read_members_lazy(members)
+            return
+        classes = {
+            'method': Method,
+            'field': Field,
         }
+        # collect the members and build the odict in one go, that's
+        # cheaper than inserting them one by one.
+        items = []
         for entry in members:
             # TODO: PLEASE add versions support.
             name, entity = entry[:2]
-            dispatch[entity['type']](entity)
+            obj = classes[entity['type']](self)
+            obj.read(entity)
+            items.append((obj.name, obj))
+        self.members = odict(items)
+
+    def read_members_lazy(self, members):
+        classes = {
+            'method': Method,
+            'field': Field,
+        }
+        self.members = LazyMembers(
+            (entity['name'], EntityStub(self, classes[entity['type']], entity))
+            for entity in (entry[1] for entry in members))
 
     def read_method(self, entity):
         obj = Method(self)
@@ -152,11 +248,11 @@ class Class(Classlike):
         self.full_name = None
 
     def read(self, data):
-        self.name = data['name']
-        self.tag = data['tag']
+        self.name = intern_string(data['name'])
+        self.tag = intern_string(data['tag'])
         self.full_name = data['fullName']
-        self.generic_types = data['genericTypes']
-        self.extends = data['extends']
+        self.generic_types = intern_list(data['genericTypes'])
+        self.extends = intern_string(data['extends'])
         self.abstract = data['abstract']
         self.doc = data['doc']
         self.read_members(data['members'])
@@ -172,28 +268,33 @@ class Cover(Classlike):
         self.full_name = None
 
     def read(self, data):
-        self.name = data['name']
-        self.tag = data['tag']
+        self.name = intern_string(data['name'])
+        self.tag = intern_string(data['tag'])
         self.full_name = data['fullName']
-        self.extends = data['extends']
-        self.from_ = data['from']
+        self.extends = intern_string(data['extends'])
+        self.from_ = intern_string(data['from'])
         self.doc = data['doc']
         self.read_members(data['members'])
 
 class Argument(object):
+    __slots__ = ('name', 'tag', 'modifiers')
+
     def __init__(self, name, tag, modifiers=None):
-        self.name = name
-        self.tag = tag
+        self.name = intern_string(name)
+        self.tag = intern_string(tag)
         # store modifiers as list, even if they can be null in the json spec
         if modifiers is None:
             modifiers = []
-        self.modifiers = modifiers
+        self.modifiers = intern_list(modifiers)
 
     @property
     def vararg(self):
         return self.name == '...'
 
 class Function(Entity):
+    __slots__ = ('name', 'tag', 'modifiers', 'generic_types', 'extern',
+                 'return_type', 'arguments')
+
     def __init__(self, parent):
         Entity.__init__(self, parent)
         # to be set in `read`
@@ -210,12 +311,12 @@ class Function(Entity):
         return self.arguments and self.arguments[-1].vararg
 
     def read(self, entity):
-        self.name = entity['name']
-        self.tag = entity['tag']
-        self.modifiers = entity['modifiers']
-        self.generic_types = entity['genericTypes']
-        self.extern = entity['extern']
-        self.return_type = entity['returnType']
+        self.name = intern_string(entity['name'])
+        self.tag = intern_string(entity['tag'])
+        self.modifiers = intern_list(entity['modifiers'])
+        self.generic_types = intern_list(entity['genericTypes'])
+        self.extern = intern_string(entity['extern'])
+        self.return_type = intern_string(entity['returnType'])
         self.doc = entity['doc']
         self.arguments = []
         for argobj in entity['arguments']:
@@ -223,10 +324,12 @@ class Function(Entity):
             self.arguments.append(arg)
 
 class Method(Function):
+    __slots__ = ()
+
     @property
     def overrides(self):
         # does any ancestor have a method like me? then i'm overriding it.
-        return any(self.name in ancestor.members for ancestor in self.parent.ancestors)
+        return self.name in self.get_module().parent.get_class_hierarchy(self.parent)[1]
 
 class Operator(Entity):
     def __init__(self, parent):
@@ -255,9 +358,27 @@ class Interface(Classlike):
         self.read_members(data['members'])
 
 class Module(Entity):
-    def __init__(self, repo):
+    #: Entity types that are only read on first access in lazy mode.
+    LAZY_ENTITIES = {
+        'function': Function,
+        'class': Class,
+        'cover': Cover,
+        'globalVariable': GlobalVariable,
+        'interface': Interface,
+        'enum': Enum,
+    }
+
+    def __init__(self, repo, lazy=False):
+        """
+            If *lazy* is true, the members of the module and of its classes
+            are `EntityStub` instances until they are accessed.
+        """
         Entity.__init__(self, repo)
-        self.members = odict()
+        self.lazy = lazy
+        if lazy:
+            self.members = LazyMembers()
+        else:
+            self.members = odict()
         self.operators = set()
         self.interface_impls = set()
         self.path = None
@@ -269,30 +390,40 @@ class Module(Entity):
     def name(self):
         return self.path
 
+    @property
+    def imports(self):
+        """
+            The paths of all modules this module imports, globally
+            or namespaced.
+        """
+        imports = list(self.global_imports or ())
+        namespaced = self.namespaced_imports or {}
+        if isinstance(namespaced, dict):
+            namespaced = namespaced.itervalues()
+        for paths in namespaced:
+            imports.extend(paths)
+        return imports
+
     def get_module(self):
         return self
 
     def resolve_type(self, tag, seen=None):
         """
             *tag*: A tag, unmodified.
+            Raise `ValueError` if the type can't be found. *seen* is
+            ignored, it's only there for backwards compatibility.
         """
-        if seen is None:
-            seen = set()
-        # TODO: namespaced imports
-        if tag in self.members:
-            return self.members[tag]
-        else:
-            # look through global imports.
-            for global_import in self.global_imports:
-                imported_module = self.parent.get_module(global_import)
-                if imported_module not in seen:
-                    seen.add(imported_module)
-                    try:
-                        return imported_module.resolve_type(tag, seen)
-                    except ValueError:
-                        continue
-            # No? Erroooooooooooor!
+        entity = self.lookup_type(tag)
+        if entity is None:
             raise ValueError(tag)
+        return entity
+
+    def lookup_type(self, tag):
+        """
+            Like `resolve_type`, but return None if the type can't be found.
+        """
+        # TODO: namespaced imports
+        return self.parent.lookup_type(self, tag)
 
     def resolve_name(self, name):
         if ' ' in name:
@@ -300,21 +431,21 @@ class Module(Entity):
             if head in self.members:
                 return self.members[head].resolve_name(tail)
             else:
-                try:
-                    return self.resolve_type(head).resolve_name(tail)
-                except ValueError:
+                entity = self.lookup_type(head)
+                if entity is None:
                     return None
+                return entity.resolve_name(tail)
         else:
             if name in self.members:
                 return self.members[name]
             else:
-                try:
-                    return self.resolve_type(name)
-                except ValueError:
+                entity = self.lookup_type(name)
+                if entity is None:
                     try:
                         return self.parent.get_module(name)
                     except ModuleNotFound:
                         return None
+                return entity
 
     def read(self, entity):
         # read the global information
@@ -338,7 +469,10 @@ class Module(Entity):
             # TODO: version support
             tag, entity = entry[:2]
             type = entity['type']
-            dispatch[type](entity)
+            if self.lazy and type in self.LAZY_ENTITIES:
+                self.members[entity['name']] = EntityStub(self, self.LAZY_ENTITIES[type], entity)
+            else:
+                dispatch[type](entity)
 
     def read_function(self, entity):
         obj = Function(self)
@@ -384,10 +518,53 @@ class Repository(object):
     """
         A repository is a directory full of `.json` files. It's
         the output directory of a `ooc -backend=json` run.
+
+        If *cache* is true, the data of already read modules is marshalled
+        to *cache_dir* (by default a `.pyooc_cache` directory inside the
+        repository) and reloaded from there as long as the `.json` file's
+        mtime and size didn't change. That saves decoding the JSON, not
+        reading the entities, so it pays off most in lazy mode. It's off
+        by default because writing the cache slows down the first load,
+        see `benchmarks/bench_repository.py`.
+
+        If *lazy* is true, module members are only read when they are
+        first accessed (see `LazyMembers`).
     """
-    def __init__(self, path):
+    def __init__(self, path, cache=False, cache_dir=None, lazy=False):
         self.path = path
+        self.cache = cache
+        self.lazy = lazy
+        if cache_dir is None:
+            cache_dir = os.path.join(path, '.pyooc_cache')
+        self.cache_dir = cache_dir
         self._modules_cache = {}
+        #: member name -> set of paths of the loaded modules defining it
+        self._symbols = {}
+        #: module path -> (import closure, first missing import, closure set)
+        self._import_closures = {}
+        #: module path -> {tag: resolved entity or None}
+        self._resolved = {}
+        #: module path -> {class entity: (ancestors, inherited member names)}
+        self._hierarchy = {}
+        #: Counters for the class hierarchy tables. `resolutions_saved` is
+        #: the number of `resolve_type` calls the tables made unnecessary.
+        self.hierarchy_stats = {
+            'hits': 0,
+            'misses': 0,
+            'resolutions_saved': 0,
+        }
+        #: imported module path -> set of paths of the loaded modules importing it
+        self._dependents = {}
+        #: module path -> (filename, mtime, size) of the loaded description
+        self._stamps = {}
+        #: Callables that are called by `refresh` with the list of the
+        #: changed module paths and the set of all affected module paths,
+        #: so caches built on top of the repository can be invalidated.
+        self.reload_listeners = []
+        # built by `_scan`.
+        self._paths = None
+        self._filenames_index = None
+        self._dir_mtimes = None
 
     def get_module(self, module):
         """
@@ -396,46 +573,392 @@ class Repository(object):
         """
         if module not in self._modules_cache:
             print module
-            self._modules_cache[module] = self._load_module(module)
+            self._add_module(module, self._load_module(module))
         return self._modules_cache[module]
 
+    def _add_module(self, path, entity):
+        """
+            Put *entity* into the module cache and register its members
+            in the symbol table.
+        """
+        self._modules_cache[path] = entity
+        symbols = self._symbols
+        for name in entity.members.iterkeys():
+            if name in symbols:
+                symbols[name].add(path)
+            else:
+                symbols[name] = set([path])
+        dependents = self._dependents
+        for imported in entity.imports:
+            if imported in dependents:
+                dependents[imported].add(path)
+            else:
+                dependents[imported] = set([path])
+        self._stamps[path] = self._get_stamp(self.get_module_filename(path))
+
+    def _remove_module(self, path):
+        entity = self._modules_cache.pop(path, None)
+        if entity is not None:
+            for name in entity.members.iterkeys():
+                paths = self._symbols.get(name)
+                if paths is not None:
+                    paths.discard(path)
+                    if not paths:
+                        del self._symbols[name]
+            for imported in entity.imports:
+                paths = self._dependents.get(imported)
+                if paths is not None:
+                    paths.discard(path)
+                    if not paths:
+                        del self._dependents[imported]
+        self._stamps.pop(path, None)
+        return self.invalidate_resolution(path)
+
+    def _get_stamp(self, filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return (filename, st.st_mtime, st.st_size)
+
+    def get_dependents(self, module):
+        """
+            Return the set of paths of all loaded modules that import
+            *module*, directly or indirectly.
+        """
+        dependents = set()
+        todo = [module]
+        while todo:
+            for path in self._dependents.get(todo.pop(), ()):
+                if path not in dependents:
+                    dependents.add(path)
+                    todo.append(path)
+        return dependents
+
+    def refresh(self):
+        """
+            Reload all loaded modules whose module description changed on
+            disk, drop the ones whose description was removed, and invalidate
+            the cached type resolutions of all their dependents.
+            Return the list of the paths of the reloaded modules.
+
+            `Module` instances of reloaded modules that are still referenced
+            elsewhere are stale afterwards.
+        """
+        if self._dir_mtimes is not None and self._index_is_stale():
+            self._scan()
+        changed = []
+        for path, stamp in self._stamps.items():
+            filename = self._filenames_index.get(path)
+            if filename is None or self._get_stamp(filename) != stamp:
+                changed.append(path)
+        affected = set()
+        for path in changed:
+            affected.update(self._remove_module(path))
+        reloaded = []
+        for path in changed:
+            if path in self._filenames_index:
+                self.get_module(path)
+                reloaded.append(path)
+        if changed:
+            for listener in self.reload_listeners:
+                listener(changed, affected)
+        return reloaded
+
+    def reload_module(self, module):
+        """
+            Read the module *module* again and return it. Cached type
+            resolutions that could be affected are dropped.
+        """
+        self._remove_module(module)
+        return self.get_module(module)
+
+    def invalidate_resolution(self, module):
+        """
+            Drop all cached type resolutions of *module* and of the modules
+            that can see it, i.e. its dependents. Return the set of the
+            paths of those modules.
+        """
+        affected = self.get_dependents(module)
+        affected.add(module)
+        for path in affected:
+            self._import_closures.pop(path, None)
+            self._resolved.pop(path, None)
+            self._hierarchy.pop(path, None)
+        return affected
+
+    def get_class_hierarchy(self, entity):
+        """
+            Return a tuple ``(ancestors, inherited)`` for the class or cover
+            *entity*: *ancestors* is a tuple of its ancestors, starting with the
+            direct superclass, and *inherited* is a frozenset of the names of
+            all members declared in any ancestor.
+            Both are computed once and then looked up in a table.
+        """
+        stats = self.hierarchy_stats
+        # Walk up until we find a class we already know, remembering
+        # the ones we don't know yet.
+        unknown = []
+        current = entity
+        while True:
+            module = current.get_module()
+            table = self._hierarchy.get(module.path)
+            if table is None:
+                table = self._hierarchy[module.path] = {}
+            hierarchy = table.get(current)
+            if hierarchy is not None:
+                stats['hits'] += 1
+                stats['resolutions_saved'] += len(hierarchy[0])
+                break
+            stats['misses'] += 1
+            unknown.append((current, table))
+            extends = getattr(current, 'extends', None)
+            if not extends:
+                # a root class.
+                current, table = unknown.pop()
+                hierarchy = table[current] = ((), frozenset())
+                break
+            current = module.resolve_type(extends)
+        # And now fill the tables from the top down.
+        for cls, table in reversed(unknown):
+            hierarchy = ((current,) + hierarchy[0],
+                         hierarchy[1].union(current.members.iterkeys()))
+            table[cls] = hierarchy
+            current = cls
+        return hierarchy
+
+    def build_hierarchy(self):
+        """
+            Fill the class hierarchy tables for all classes and covers of all
+            loaded modules, so `Classlike.ancestors` and `Method.overrides`
+            are plain lookups from now on.
+        """
+        for module in self._modules_cache.values():
+            for member in module.members.itervalues():
+                if isinstance(member, (Class, Cover)):
+                    self.get_class_hierarchy(member)
+
+    def _get_import_closure(self, entity):
+        """
+            Return a tuple ``(order, missing, visible)``: *order* is the list
+            of the paths of all modules visible from *entity*, in the order
+            they are searched (depth-first through the global imports).
+            If the search hits an import that can't be found, *missing* is
+            its path and the search stops there. *visible* is *order* as a set.
+        """
+        try:
+            return self._import_closures[entity.path]
+        except KeyError:
+            pass
+        order = [entity.path]
+        visible = set(order)
+        missing = None
+        stack = [iter(entity.global_imports)]
+        while stack and missing is None:
+            for global_import in stack[-1]:
+                if global_import not in visible:
+                    visible.add(global_import)
+                    try:
+                        imported_module = self.get_module(global_import)
+                    except ModuleNotFound:
+                        missing = global_import
+                        break
+                    order.append(global_import)
+                    stack.append(iter(imported_module.global_imports))
+                    break
+            else:
+                stack.pop()
+        closure = self._import_closures[entity.path] = (order, missing, visible)
+        return closure
+
+    def lookup_type(self, entity, tag):
+        """
+            Resolve *tag* as seen from the module *entity*: search the module
+            itself and then its global imports, depth-first. Return the entity
+            or None if nothing was found. Results are memoized until one of
+            the visible modules is reloaded.
+        """
+        resolved = self._resolved.get(entity.path)
+        if resolved is None:
+            resolved = self._resolved[entity.path] = {}
+        elif tag in resolved:
+            return resolved[tag]
+        if tag in entity.members:
+            result = entity.members[tag]
+        else:
+            result = None
+            order, missing, visible = self._get_import_closure(entity)
+            candidates = self._symbols.get(tag)
+            if candidates:
+                for path in order[1:]:
+                    if path in candidates:
+                        result = self._modules_cache[path].members[tag]
+                        break
+            if result is None and missing is not None:
+                raise ModuleNotFound(missing)
+        resolved[tag] = result
+        return result
+
     def get_all_paths(self):
         """
             Get all possible module paths.
         """
+        if self._paths is None:
+            self._scan()
+        return list(self._paths)
+
+    def _scan(self):
+        """
+            Walk the repository once and build the list of module paths
+            and the index mapping module paths to `.json` filenames.
+        """
         paths = []
+        # module path -> (priority, filename). Lower priority wins; this
+        # mimics the search order `get_module_filename` used to have.
+        candidates = {}
+        dir_mtimes = {}
+        cache_dir = os.path.abspath(self.cache_dir)
         for dirpath, dirnames, filenames in os.walk(self.path):
-            splitted = os.path.relpath(dirpath, self.path).split(os.path.sep)
+            if os.path.abspath(dirpath) == cache_dir:
+                del dirnames[:]
+                continue
+            dir_mtimes[dirpath] = os.stat(dirpath).st_mtime
+            relpath = os.path.relpath(dirpath, self.path)
+            splitted = relpath.split(os.path.sep)
             if len(splitted) > 2:
                 package = '/'.join(splitted[2:])
             else:
                 package = '/'.join(splitted[1:])
+            dirparts = [] if relpath == os.curdir else splitted
             for filename in filenames:
                 if filename.endswith('.json'):
+                    name = os.path.splitext(filename)[0]
                     if package:
-                        paths.append(package + '/' + os.path.splitext(filename)[0])
+                        paths.append(package + '/' + name)
                     else:
-                        paths.append(os.path.splitext(filename)[0])
-        return paths
+                        paths.append(name)
+                    # A module can live in `<package>/`, `<package>/<subdir>/`
+                    # or directly in the repository root.
+                    full_filename = os.path.join(dirpath, filename)
+                    for priority, start in ((0, 1), (1, 2), (2, 0)):
+                        if start > len(dirparts):
+                            continue
+                        module = '/'.join(dirparts[start:] + [name])
+                        if (module not in candidates
+                                or candidates[module][0] > priority):
+                            candidates[module] = (priority, full_filename)
+        self._paths = paths
+        self._filenames_index = dict(
+            (module, filename) for module, (priority, filename) in candidates.iteritems())
+        self._dir_mtimes = dir_mtimes
+
+    def _index_is_stale(self):
+        for dirpath, mtime in self._dir_mtimes.iteritems():
+            try:
+                if os.stat(dirpath).st_mtime != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def refresh_index(self):
+        """
+            Rescan the repository directory. Call this if module descriptions
+            were added or removed; `get_module_filename` also rescans by itself
+            if a module can't be found and the directory changed.
+        """
+        self._scan()
 
     def get_all_modules(self):
         """
             Get all possible modules as a dictionary mapping module paths to module instances.
         """
-        return dict((path, self.get_module(path)) for path in self.get_all_paths())
+        # Reading modules allocates lots of objects and no garbage cycles,
+        # so the cyclic GC would only walk the growing heap again and again.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return dict((path, self.get_module(path)) for path in self.get_all_paths())
+        finally:
+            if gc_enabled:
+                gc.enable()
 
     def _load_module(self, module):
         """
             Load the `Module` instance specified by the ooc module path *module*
             and return it.
         """
-        filename = self.get_module_filename(module)
-        with open(filename, 'r') as f:
-            data = json.load(f)
-        entity = Module(self)
+        with timing.phase('load'):
+            return self._read_module(self.get_module_filename(module))
+
+    def _read_module(self, filename):
+        """
+            Read the module description *filename*, or get its data from
+            the on-disk cache, and return the `Module` instance.
+        """
+        data = None
+        if self.cache:
+            data = self._load_cached(filename)
+        if data is None:
+            with open(filename, 'r') as f:
+                data = json.load(f)
+            if self.cache:
+                self._store_cached(filename, data)
+        entity = Module(self, self.lazy)
         entity.read(data)
         return entity
 
+    def _get_cache_filename(self, filename):
+        key = hashlib.sha1(os.path.abspath(filename)).hexdigest()
+        return os.path.join(self.cache_dir, key + '.marshal')
+
+    def _get_cache_key(self, filename):
+        st = os.stat(filename)
+        return (CACHE_VERSION, os.path.abspath(filename), st.st_mtime, st.st_size)
+
+    def _load_cached(self, filename):
+        """
+            Return the cached data of the module description *filename*,
+            or None if there is no up-to-date cache entry.
+        """
+        try:
+            with open(self._get_cache_filename(filename), 'rb') as f:
+                if marshal.load(f) != self._get_cache_key(filename):
+                    return None
+                return marshal.load(f)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def _store_cached(self, filename, data):
+        try:
+            makedirs(self.cache_dir)
+            with atomic_write(self._get_cache_filename(filename)) as f:
+                # `marshal.dump` writes byte by byte, this is faster.
+                f.write(marshal.dumps(self._get_cache_key(filename)))
+                f.write(marshal.dumps(data))
+        except (IOError, OSError):
+            # Caching is best-effort only.
+            pass
+
+    def invalidate_cache(self, module=None):
+        """
+            Remove the cached module description of *module* from the
+            on-disk cache, or clear the whole cache if *module* is None.
+            The in-memory module cache is cleared as well.
+        """
+        if module is None:
+            for path in self._modules_cache.keys():
+                self._remove_module(path)
+            if os.path.isdir(self.cache_dir):
+                for filename in os.listdir(self.cache_dir):
+                    if filename.endswith('.marshal'):
+                        os.remove(os.path.join(self.cache_dir, filename))
+        else:
+            self._remove_module(module)
+            cache_filename = self._get_cache_filename(self.get_module_filename(module))
+            if os.path.isfile(cache_filename):
+                os.remove(cache_filename)
+
     def get_module_filename(self, module):
         """
             Get the filename of the module description for *module*.
@@ -443,20 +966,14 @@ class Repository(object):
             which will be translated to the filename "text/StringTokenizer.json").
             If the module is not found, `ModuleNotFound` is thrown.
         """
-        parts = module.split('/')
-        parts[-1] += '.json'
-        filename = os.path.join(*parts)
-        # Search for the constructed filename in all subdirectories of `self.path` (depth 2)
-        for packagedir in os.listdir(self.path):
-            packagedir = os.path.join(self.path, packagedir)
-            subdirs = ['']
-            if os.path.isdir(packagedir):
-                subdirs.extend(os.listdir(packagedir))
-            else:
-                packagedir = self.path
-            for subdir in subdirs:
-                subfilename = os.path.join(packagedir, subdir, filename)
-                if os.path.isfile(subfilename):
-                    return subfilename
-        raise ModuleNotFound(module)
-
+        if self._filenames_index is None:
+            self._scan()
+        try:
+            return self._filenames_index[module]
+        except KeyError:
+            # Maybe the module was added after we built the index.
+            if self._index_is_stale():
+                self._scan()
+                if module in self._filenames_index:
+                    return self._filenames_index[module]
+            raise ModuleNotFound(module)
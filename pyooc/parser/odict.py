@@ -1,33 +1,158 @@
-# from http://code.activestate.com/recipes/496761/
+# Ordered dictionary. The interface is the one of the recipe from
+# http://code.activestate.com/recipes/496761/ this used to be, but
+# it's a `dict` subclass now, so lookups run at native speed.
+from collections import KeysView, ValuesView, ItemsView
 
-from UserDict import DictMixin
+#: Up to this size, deleting just removes the key from the list, that's
+#: cheap enough.
+_SMALL = 64
+
+class odict(dict):
+    """
+        A dictionary that remembers insertion order.
+
+        The keys are stored in a list, too. Deleting a key from a big
+        mapping leaves its list entry behind instead of removing it, so
+        deletion is O(1); a key's entry is always its last one in the
+        list, since it's only appended when the key isn't in the mapping.
+        The list is compacted before iterating, or once more than half of
+        it are leftovers.
+
+        Inserting and deleting single keys goes through Python code on
+        top of the `dict` storage and is a bit slower than with the
+        recipe; pass all items to the constructor where possible.
+
+        Everything that goes through the `dict` storage directly instead
+        of the methods below (``dict(d)``, ``f(**d)``, ``d == {...}`` in C
+        code) sees the keys in no particular order.
+    """
+    # an instance dictionary makes every access to `_keys` slower.
+    __slots__ = ('_keys',)
 
-class odict(DictMixin):
     def __init__(self, init=None):
-        self._keys = []
-        self._data = {}
-        if init is not None:
-            for key, value in init:
-                self[key] = value
-    
-    def __setitem__(self, key, value):
-        if key not in self._data:
+        if init is None:
+            self._keys = []
+            return
+        # fill the storage in one go instead of going through `__setitem__`.
+        items = list(init)
+        dict.update(self, items)
+        keys = [key for key, value in items]
+        if len(keys) != len(self):
+            # a key given twice keeps its first position.
+            seen = set()
+            keys = [key for key in keys if not (key in seen or seen.add(key))]
+        self._keys = keys
+
+    def __reduce__(self):
+        # Don't let pickle go through `__setitem__` before `__init__` ran.
+        return (type(self), ([(key, dict.__getitem__(self, key)) for key in self],))
+
+    def __setitem__(self, key, value, dict_setitem=dict.__setitem__):
+        if key not in self:
             self._keys.append(key)
-        self._data[key] = value
-        
-    def __getitem__(self, key):
-        return self._data[key]
-    
-    def __delitem__(self, key):
-        del self._data[key]
-        self._keys.remove(key)
-        
+        dict_setitem(self, key, value)
+
+    def __delitem__(self, key, dict_delitem=dict.__delitem__):
+        dict_delitem(self, key)
+        keys = self._keys
+        if len(keys) <= _SMALL:
+            # small lists never have leftovers, see below.
+            keys.remove(key)
+        elif (len(keys) - len(self)) * 2 > len(keys):
+            self._compact()
+
+    def _compact(self):
+        seen = set()
+        keys = []
+        for key in reversed(self._keys):
+            if key not in seen and key in self:
+                seen.add(key)
+                keys.append(key)
+        keys.reverse()
+        self._keys = keys
+
+    def __iter__(self):
+        if len(self._keys) != len(self):
+            self._compact()
+        return iter(self._keys)
+
+    iterkeys = __iter__
+
     def keys(self):
-        return list(self._keys)
-    
+        return list(self.__iter__())
+
+    def itervalues(self):
+        getitem = dict.__getitem__
+        for key in self:
+            yield getitem(self, key)
+
+    def iteritems(self):
+        getitem = dict.__getitem__
+        for key in self:
+            yield (key, getitem(self, key))
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+    # The `dict` views would iterate over the storage.
+    def viewkeys(self):
+        return KeysView(self)
+
+    def viewvalues(self):
+        return ValuesView(self)
+
+    def viewitems(self):
+        return ItemsView(self)
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        elif default:
+            return default[0]
+        raise KeyError(key)
+
+    def popitem(self):
+        if not self:
+            raise KeyError('dictionary is empty')
+        # the first item, like the recipe.
+        key = iter(self).next()
+        return (key, self.pop(key))
+
+    def update(self, other=None, **kwargs):
+        if other is not None:
+            if hasattr(other, 'keys'):
+                for key in other.keys():
+                    self[key] = other[key]
+            else:
+                for key, value in other:
+                    self[key] = value
+        for key, value in kwargs.iteritems():
+            self[key] = value
+
+    def clear(self):
+        dict.clear(self)
+        self._keys = []
+
     def copy(self):
-        copyDict = odict()
-        copyDict._data = self._data.copy()
-        copyDict._keys = self._keys[:]
-        return copyDict
+        return odict(self.iteritems())
+
+    def __eq__(self, other):
+        # order doesn't matter, like for the recipe.
+        return dict(self.iteritems()) == other
+
+    def __ne__(self, other):
+        return not self == other
 
+    def __repr__(self):
+        return 'odict(%r)' % (self.items(),)
@@ -1,3 +1,6 @@
+import re
+from collections import OrderedDict
+
 class Token(object):
     INVALID = 0
     IDENTIFIER = 1
@@ -70,8 +73,88 @@ def _parse(next, token):
 def parse(stream):
     return _parse(stream.next, stream.next())[1]
 
+#: A delimiter (eating the following spaces) or an identifier. Identifiers
+#: may contain spaces, e.g. `unsigned int`.
+_TOKEN_RE = re.compile(r'([(),]) *|([^(),]+)')
+
+_DELIMITERS = {
+    '(': (Token.LPAREN, '('),
+    ')': (Token.RPAREN, ')'),
+    ',': (Token.COMMA, ','),
+}
+
+_END = (Token.END, '')
+
+def tokenize(s):
+    """
+        Split *s* into a list of tokens, like `lex` does, but in one go.
+    """
+    tokens = []
+    for delimiter, identifier in _TOKEN_RE.findall(s):
+        if delimiter:
+            tokens.append(_DELIMITERS[delimiter])
+        else:
+            tokens.append((Token.IDENTIFIER, identifier))
+    tokens.append(_END)
+    return tokens
+
+def _parse_tokens(tokens, pos):
+    """
+        Parse the value starting at *tokens[pos]*. Return a tuple
+        ``(position of the token after it, value)``.
+    """
+    kind, value = tokens[pos]
+    if kind != Token.IDENTIFIER:
+        raise ParsingError('Unexpected token: %r' % (tokens[pos],))
+    pos += 1
+    kind = tokens[pos][0]
+    if kind in (Token.END, Token.COMMA, Token.RPAREN):
+        return (pos, value)
+    elif kind == Token.LPAREN:
+        args = []
+        pos += 1
+        while tokens[pos][0] != Token.RPAREN:
+            pos, new_arg = _parse_tokens(tokens, pos)
+            args.append(new_arg)
+            kind = tokens[pos][0]
+            if kind == Token.COMMA:
+                pos += 1
+            elif kind != Token.RPAREN:
+                raise ParsingError('Malformed argument list, unexpected token: %r' % (tokens[pos],))
+        # skip the closing paren.
+        return (pos + 1, (value, tuple(args)))
+    else:
+        raise ParsingError('Unexpected token: %r' % (tokens[pos],))
+
+#: Maximum number of parsed tags `parse_string` remembers.
+CACHE_SIZE = 4096
+
+#: tag string -> parse tree, oldest first.
+_cache = OrderedDict()
+
 def parse_string(s):
-    return parse(lex(iter(s).next))
+    """
+        Parse the tag *s* and return its parse tree: either a string
+        or a tuple ``(modifier, (argument, ...))``. Parse trees are
+        immutable, so they are cached and shared.
+    """
+    try:
+        return _cache[s]
+    except KeyError:
+        pass
+    if '(' not in s and ')' not in s and ',' not in s:
+        # just a name.
+        tokens = [(Token.IDENTIFIER, s), _END]
+    else:
+        tokens = tokenize(s)
+    parsed = _parse_tokens(tokens, 0)[1]
+    if len(_cache) >= CACHE_SIZE:
+        _cache.popitem(last=False)
+    _cache[s] = parsed
+    return parsed
+
+def clear_cache():
+    _cache.clear()
 
 def translate(parsed):
     """
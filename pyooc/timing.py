@@ -0,0 +1,172 @@
+"""
+    Opt-in timing of the phases of binding a repository::
+
+        import pyooc.timing as timing
+        timing.enable()
+        bind_repository(lib, repo)
+        print timing.format_report()
+
+    The code doing the work of each phase (see `PHASES`) runs in a
+    `phase` block, and binding a module (`pyooc.bind.bind_module`,
+    `pyooc.bind.plan.apply_module`, which `pyooc.bind.plan.apply_plan`
+    uses, and the ``bind`` function of modules generated by
+    `pyooc.bind.codegen`) runs in a `module` block. Their wall time and
+    calls are recorded, in total and per module being bound. Unless
+    timing is enabled, the blocks do nothing.
+
+    Times are inclusive: a phase running inside another one (`dlsym`
+    while resolving a type, for example) counts for both. Recursive runs
+    of a phase are counted, but only timed once.
+"""
+import time
+
+#: The phases: reading module descriptions, resolving type references
+#: (cache misses only), looking up symbols, setting up classes and
+#: getting class pointers.
+PHASES = ['load', 'resolve', 'dlsym', 'setup', 'class_']
+
+_enabled = False
+#: phase -> [calls, seconds]
+_phases = {}
+#: module path -> [seconds, {phase: [calls, seconds]}]
+_modules = {}
+#: paths of the modules being bound right now, innermost last.
+_module_stack = []
+#: phase -> number of running calls.
+_depth = {}
+
+def is_enabled():
+    return _enabled
+
+def enable():
+    """
+        Start recording.
+    """
+    global _enabled
+    _enabled = True
+
+def disable():
+    """
+        Stop recording. The recorded data stays until `reset` is called.
+    """
+    global _enabled
+    _enabled = False
+
+def reset():
+    """
+        Forget everything recorded so far.
+    """
+    _phases.clear()
+    _modules.clear()
+
+def _record(phase, seconds, timed):
+    stats = _phases.setdefault(phase, [0, 0.0])
+    stats[0] += 1
+    if timed:
+        stats[1] += seconds
+    if _module_stack:
+        stats = _modules[_module_stack[-1]][1].setdefault(phase, [0, 0.0])
+        stats[0] += 1
+        if timed:
+            stats[1] += seconds
+
+class _Nothing(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+_nothing = _Nothing()
+
+class _Phase(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.depth = _depth.get(self.name, 0)
+        _depth[self.name] = self.depth + 1
+        self.start = time.time()
+
+    def __exit__(self, *exc_info):
+        _depth[self.name] = self.depth
+        _record(self.name, time.time() - self.start, self.depth == 0)
+
+class _Module(object):
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        _modules.setdefault(self.path, [0.0, {}])
+        _module_stack.append(self.path)
+        self.start = time.time()
+
+    def __exit__(self, *exc_info):
+        _module_stack.pop()
+        if self.path not in _module_stack:
+            _modules[self.path][0] += time.time() - self.start
+
+def phase(name):
+    """
+        Return a context manager timing its block as the phase *name* (see
+        `PHASES`) if timing is enabled.
+    """
+    if not _enabled:
+        return _nothing
+    return _Phase(name)
+
+def module(path):
+    """
+        Return a context manager attributing its block and the phases
+        running in it to the module *path* if timing is enabled. Nested
+        blocks of the same module are timed once.
+    """
+    if not _enabled:
+        return _nothing
+    return _Module(path)
+
+def _phase_dict(phases):
+    return dict((phase, {'calls': calls, 'seconds': seconds})
+                for phase, (calls, seconds) in phases.iteritems())
+
+def report():
+    """
+        Return the recorded data as a dictionary that can be dumped as
+        JSON::
+
+            {'phases': {phase: {'calls': ..., 'seconds': ...}},
+             'modules': {path: {'seconds': ..., 'phases': {...}}}}
+    """
+    return {
+        'phases': _phase_dict(_phases),
+        'modules': dict((path, {'seconds': seconds, 'phases': _phase_dict(phases)})
+                        for path, (seconds, phases) in _modules.iteritems()),
+    }
+
+def format_report(data=None, modules=20):
+    """
+        Return the report *data* (by default, the current `report`) as a
+        human-readable table, listing the *modules* slowest modules.
+    """
+    if data is None:
+        data = report()
+    names = list(PHASES)
+    names.extend(sorted(set(data['phases']) - set(names)))
+    lines = ['%-12s %10s %10s' % ('phase', 'calls', 'seconds')]
+    for phase in names:
+        if phase in data['phases']:
+            stats = data['phases'][phase]
+            lines.append('%-12s %10d %10.3f' % (phase, stats['calls'], stats['seconds']))
+    if data['modules']:
+        lines.append('')
+        lines.append('%-40s %10s' % ('module', 'seconds') +
+                     ''.join(' %10s' % phase for phase in names))
+        slowest = sorted(data['modules'].iteritems(),
+                         key=lambda item: item[1]['seconds'], reverse=True)
+        for path, stats in slowest[:modules]:
+            lines.append('%-40s %10.3f' % (path, stats['seconds']) +
+                         ''.join(' %10.3f' % stats['phases'].get(phase, {}).get('seconds', 0.0)
+                                 for phase in names))
+        if len(slowest) > modules:
+            lines.append('(%d more modules)' % (len(slowest) - modules))
+    return '\n'.join(lines)
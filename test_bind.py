@@ -0,0 +1,134 @@
+"""
+    Smoke check of `pyooc.bind`: binding plans are saved and loaded
+    (on a synthetic repository generated by `benchmarks/repogen.py`),
+    and `pyooc.bind.utils.compile_and_bind` uses its build cache. rock
+    isn't needed, the build cache is checked with a fake compiler that
+    builds a stub runtime (see `benchmarks/stubruntime.py`), so it needs
+    a C compiler (`cc`).
+"""
+import os
+import sys
+import stat
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS = os.path.join(ROOT, 'benchmarks')
+sys.path.insert(0, BENCHMARKS)
+
+from pyooc.parser import Repository
+from pyooc.bind import plan
+from pyooc.bind.utils import compile_and_bind, get_cache_key, prune_cache
+import repogen
+
+# Answers `rock -backend=json` and `rock -o=...` the way the build
+# cache calls them: `answer: func -> Int { <number> }` becomes a module
+# with an `answer` function returning that number. Every run is logged.
+FAKE_COMPILER = r'''#!%(python)s
+import os
+import re
+import sys
+import json
+sys.path[:0] = [%(root)r, %(benchmarks)r]
+import stubruntime
+
+args = sys.argv[1:]
+source = args[-1]
+name = os.path.splitext(os.path.basename(source))[0]
+with open(%(log)r, 'a') as f:
+    f.write(name + '\n')
+if args[0] == '-backend=json':
+    outpath = args[1][len('-outpath='):]
+    os.makedirs(outpath)
+    with open(os.path.join(outpath, name + '.json'), 'w') as f:
+        json.dump({
+            'path': name,
+            'globalImports': [],
+            'namespacedImports': {},
+            'uses': [],
+            'entities': [['answer', {
+                'type': 'function', 'name': 'answer', 'tag': 'answer',
+                'modifiers': [], 'genericTypes': [], 'extern': None,
+                'returnType': 'Int', 'doc': '', 'arguments': [],
+            }]],
+        }, f)
+else:
+    value = int(re.search(r'\{ *(\d+) *\}', open(source).read()).group(1))
+    lib_filename = args[0][len('-o='):]
+    built = stubruntime.build(os.path.dirname(lib_filename), name,
+                              stubruntime.source([name], 'int %%s__answer(void) { return %%d; }'
+                                                         %% (name, value)))
+    os.rename(built, lib_filename)
+'''
+
+tmpdir = tempfile.mkdtemp('.bind')
+try:
+    # plan save/load
+    root = os.path.join(tmpdir, 'repo')
+    repogen.generate(root, modules=4, classes=2, methods=2)
+    repo = Repository(root)
+    made = plan.make_plan(repo, ['pkg/mod3'])
+    assert made['modules'].keys() == ['pkg/mod0', 'pkg/mod1', 'pkg/mod2', 'pkg/mod3']
+    assert plan.plan_is_current(made, repo)
+    os.mkdir(os.path.join(tmpdir, 'plans'))
+    filename = os.path.join(tmpdir, 'plans', 'sdk.plan')
+    assert plan.load_plan(filename) is None
+    plan.save_plan(made, filename)
+    # no temporary files are left behind.
+    assert os.listdir(os.path.dirname(filename)) == ['sdk.plan']
+    loaded = plan.load_plan(filename, repo)
+    assert loaded == made
+    # a changed module description outdates the plan.
+    description = repo.get_module_filename('pkg/mod1')
+    st = os.stat(description)
+    os.utime(description, (st.st_atime, st.st_mtime + 2))
+    assert not plan.plan_is_current(loaded, repo)
+    assert plan.load_plan(filename, repo) is None
+    assert plan.load_plan(filename) == made
+    # so does a removed one.
+    os.remove(description)
+    assert not plan.plan_is_current(loaded, Repository(root))
+    # garbage isn't a plan.
+    with open(filename, 'wb') as f:
+        f.write('garbage')
+    assert plan.load_plan(filename) is None
+    print 'OK: plan save/load'
+
+    # build cache
+    log = os.path.join(tmpdir, 'compiler.log')
+    compiler = os.path.join(tmpdir, 'fakerock')
+    with open(compiler, 'w') as f:
+        f.write(FAKE_COMPILER % {'python': sys.executable, 'root': ROOT,
+                                'benchmarks': BENCHMARKS, 'log': log})
+    os.chmod(compiler, os.stat(compiler).st_mode | stat.S_IXUSR)
+    def runs():
+        if not os.path.exists(log):
+            return 0
+        with open(log) as f:
+            return len(f.readlines())
+    cache_dir = os.path.join(tmpdir, 'cache')
+
+    module = compile_and_bind('answer: func -> Int { 42 }', compiler, cache_dir)
+    assert module.answer().value == 42
+    # the JSON backend and the compiler.
+    assert runs() == 2
+    assert os.listdir(cache_dir) == [get_cache_key('answer: func -> Int { 42 }', compiler)]
+    module = compile_and_bind('answer: func -> Int { 42 }', compiler, cache_dir)
+    assert module.answer().value == 42
+    assert runs() == 2
+    module = compile_and_bind('answer: func -> Int { 23 }', compiler, cache_dir)
+    assert module.answer().value == 23
+    assert runs() == 4
+    assert len(os.listdir(cache_dir)) == 2
+    assert len(prune_cache(cache_dir, max_size=0)) == 2
+    assert os.listdir(cache_dir) == []
+    module = compile_and_bind('answer: func -> Int { 42 }', compiler, cache_dir)
+    assert module.answer().value == 42
+    assert runs() == 6
+    # without a cache, the build is thrown away.
+    module = compile_and_bind('answer: func -> Int { 5 }', compiler)
+    assert module.answer().value == 5
+    assert runs() == 8
+    print 'OK: build cache'
+finally:
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,73 @@
+"""
+    Smoke check: create real `pyooc.ffi.Library` objects on stub shared
+    libraries built by `benchmarks/stubruntime.py`. Needs a C compiler
+    (`cc`).
+
+    The first stub has no ooc runtime: creating the library has to get
+    through looking up symbols and fail cleanly at the first one the
+    stub doesn't have. The second one has every `lang/*` module and
+    class `pyooc.ffi.types.Types` needs, so creating the library has to
+    get through `Types.setup`, layout checks included. It also has a
+    function taking a closure, to call typed closures through.
+"""
+import os
+import sys
+import ctypes
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import pyooc.ffi as ffi
+import stubruntime
+
+NO_RUNTIME = r'''
+void lang_types_load(void) {}
+'''
+
+CLOSURES = r'''
+typedef struct { int (*thunk)(int, void *); void *context; } closures__Closure;
+int closures__apply(closures__Closure f, int x) { return f.thunk(x, f.context); }
+'''
+
+tmpdir = tempfile.mkdtemp('.stub')
+try:
+    try:
+        ffi.Library(stubruntime.build(tmpdir, 'stub', NO_RUNTIME))
+    except AttributeError, e:
+        # `lang/types` is loaded, the next module isn't in the stub.
+        assert 'undefined symbol' in str(e), e
+        assert 'lang_types_load' not in str(e), e
+        print 'OK:', e
+    else:
+        assert False, 'the stub library has no ooc runtime'
+
+    lib = ffi.Library(stubruntime.build(tmpdir, 'runtime',
+                                        stubruntime.source(['closures'], CLOSURES)))
+    closure = lib.types.Closure
+    assert closure._struct is closure
+    assert lib._get_class_struct(closure.class_()).size.value == ctypes.sizeof(closure)
+    # `Closure` is laid out, so it can be used in arrays.
+    assert ctypes.sizeof(closure * 3) == 3 * ctypes.sizeof(closure)
+    print 'OK: Types.setup'
+
+    # typed closures
+    types = lib.types
+    IntClosure = types.get_closure_type(types.Int, [types.Int])
+    assert types.get_closure_type(types.Int, (types.Int,)) is IntClosure
+    assert types.get_closure_type(types.Int, [types.Int, types.Int]) is not IntClosure
+    assert issubclass(IntClosure, closure)
+    module = lib.get_module('closures')
+    apply = module.generic_function('apply', [], types.Int, [IntClosure, types.Int])
+    double = IntClosure.from_callable(lambda x: x.value * 2)
+    assert apply(double, 21).value == 42
+    # plain callables and untyped closures are coerced. Arguments of
+    # subclassed ctypes types aren't converted to Python values.
+    assert apply(lambda x: x.value + 1, 41).value == 42
+    untyped = closure(thunk=double.thunk, context=None)
+    assert IntClosure.coerce(untyped).thunk == double.thunk
+    assert apply(untyped, 4).value == 8
+    assert IntClosure.coerce(42) == 42
+    print 'OK: typed closures'
+finally:
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,206 @@
+"""
+    Smoke check of `pyooc.parser` on synthetic repositories generated by
+    `benchmarks/repogen.py`: the module cache, the path index, lazy
+    members, the symbol table, the class hierarchy tables, `refresh`, the
+    tag tokenizer and `odict`. Doesn't need a compiler.
+"""
+import os
+import sys
+import shutil
+import pickle
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import pyooc.parser as parser
+from pyooc.parser import Repository, ModuleNotFound, EntityStub
+from pyooc.parser.odict import odict
+from pyooc.parser import tag
+import repogen
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+def touch(filename):
+    # make sure the mtime changes, even on filesystems with 1s resolution.
+    st = os.stat(filename)
+    os.utime(filename, (st.st_atime, st.st_mtime + 2))
+
+def rewrite(filename, change):
+    with open(filename) as f:
+        data = json.load(f)
+    change(data)
+    with open(filename, 'w') as f:
+        json.dump(data, f)
+    touch(filename)
+
+tmpdir = tempfile.mkdtemp('.repo')
+try:
+    root = os.path.join(tmpdir, 'repo')
+    paths = repogen.generate(root, modules=6, classes=3, methods=2)
+    cache_dir = os.path.join(tmpdir, 'cache')
+
+    # path index
+    repo = Repository(root)
+    assert sorted(repo.get_all_paths()) == sorted(paths + ['lang/types'])
+    filename = repo.get_module_filename('pkg/mod3')
+    assert filename == os.path.join(root, 'sdk', 'pkg', 'mod3.json'), filename
+    try:
+        repo.get_module_filename('pkg/nope')
+    except ModuleNotFound:
+        pass
+    else:
+        assert False, 'pkg/nope exists?'
+    # added modules are found without an explicit rescan.
+    shutil.copy(filename, os.path.join(root, 'sdk', 'pkg', 'added.json'))
+    assert repo.get_module_filename('pkg/added').endswith('added.json')
+    os.remove(os.path.join(root, 'sdk', 'pkg', 'added.json'))
+    repo.refresh_index()
+    assert 'pkg/added' not in repo.get_all_paths()
+    print 'OK: path index'
+
+    # module cache
+    eager = Repository(root).get_all_modules()
+    for lazy in (False, True):
+        cold = Repository(root, cache=True, cache_dir=cache_dir, lazy=lazy)
+        cold.get_all_modules()
+        assert len(os.listdir(cache_dir)) == len(eager)
+        warm = Repository(root, cache=True, cache_dir=cache_dir, lazy=lazy)
+        assert warm._load_cached(filename) is not None
+        for path, module in warm.get_all_modules().iteritems():
+            assert module.parent is warm
+            assert module.members.keys() == eager[path].members.keys()
+        # a changed description isn't read from the cache.
+        touch(filename)
+        assert warm._load_cached(filename) is None
+        warm.invalidate_cache()
+        assert os.listdir(cache_dir) == []
+    # garbage in the cache is ignored.
+    repo = Repository(root, cache=True, cache_dir=cache_dir)
+    repo.get_module('pkg/mod3')
+    with open(repo._get_cache_filename(filename), 'wb') as f:
+        f.write('garbage')
+    assert Repository(root, cache=True, cache_dir=cache_dir).get_module('pkg/mod3').members
+    print 'OK: module cache'
+
+    # lazy members
+    repo = Repository(root, lazy=True)
+    module = repo.get_module('pkg/mod2')
+    members = module.members
+    assert members.keys() == eager['pkg/mod2'].members.keys()
+    assert type(dict.__getitem__(members, 'C2_1')) is EntityStub
+    assert 'C2_1' in members and 'nope' not in members
+    assert type(dict.__getitem__(members, 'C2_1')) is EntityStub
+    cls = members['C2_1']
+    assert isinstance(cls, parser.Class) and cls.extends == 'C2_0'
+    assert dict.__getitem__(members, 'C2_1') is cls
+    assert type(dict.__getitem__(cls.members, 'method0')) is EntityStub
+    assert cls.members.get('method0').return_type == 'Int'
+    assert cls.members.get('nope') is None
+    assert all(not isinstance(value, EntityStub) for value in members.itervalues())
+    print 'OK: lazy members'
+
+    # symbol table: types are found through the global imports.
+    repo = Repository(root)
+    mod3 = repo.get_module('pkg/mod3')
+    assert repo.lookup_type(mod3, 'C3_0') is mod3.members['C3_0']
+    assert repo.lookup_type(mod3, 'C2_2') is repo.get_module('pkg/mod2').members['C2_2']
+    # through pkg/mod2 and pkg/mod1.
+    assert repo.lookup_type(mod3, 'C0_0') is repo.get_module('pkg/mod0').members['C0_0']
+    # pkg/mod4 imports pkg/mod3, not the other way round.
+    repo.get_module('pkg/mod4')
+    assert repo.lookup_type(mod3, 'C4_0') is None
+    assert repo.lookup_type(mod3, 'Object') is repo.get_module('lang/types').members['Object']
+    assert repo.get_dependents('pkg/mod2') >= set(['pkg/mod3'])
+    print 'OK: symbol table'
+
+    # hierarchy tables
+    repo = Repository(root)
+    repo.get_all_modules()
+    cls = repo.get_module('pkg/mod2').members['C2_1']
+    ancestors, inherited = repo.get_class_hierarchy(cls)
+    assert [a.name for a in ancestors] == ['C2_0', 'C1_2', 'C1_1', 'C1_0', 'C0_2',
+                                          'C0_1', 'C0_0', 'Object'], ancestors
+    assert inherited == frozenset(name for a in ancestors for name in a.members)
+    assert 'method0' in inherited and 'run' not in inherited
+    assert cls.ancestors == list(ancestors)
+    hits = repo.hierarchy_stats['hits']
+    repo.get_class_hierarchy(cls)
+    assert repo.hierarchy_stats['hits'] == hits + 1
+    repo.build_hierarchy()
+    print 'OK: hierarchy tables'
+
+    # refresh
+    repo = Repository(root)
+    repo.get_all_modules()
+    reloaded = []
+    repo.reload_listeners.append(lambda changed, affected: reloaded.append((changed, affected)))
+    assert repo.refresh() == []
+    old_module = repo.get_module('pkg/mod3')
+    rewrite(filename, lambda data: data['entities'].append(
+        ['added', repogen.function('added', return_type='Int')]))
+    assert repo.refresh() == ['pkg/mod3']
+    assert repo.get_module('pkg/mod3') is not old_module
+    assert 'added' in repo.get_module('pkg/mod3').members
+    changed, affected = reloaded[0]
+    assert changed == ['pkg/mod3'] and 'pkg/mod4' in affected
+    # removed modules are dropped.
+    os.remove(os.path.join(root, 'sdk', 'pkg', 'mod5.json'))
+    assert repo.refresh() == []
+    assert 'pkg/mod5' not in repo.get_all_paths()
+    print 'OK: refresh'
+finally:
+    shutil.rmtree(tmpdir)
+
+# tag tokenizer
+TAGS = [
+    ('Int', 'Int'),
+    ('unsigned int', 'unsigned int'),
+    ('pointer(Char)', ('pointer', ('Char',))),
+    ('pointer(pointer(unsigned long long))',
+        ('pointer', (('pointer', ('unsigned long long',)),))),
+    ('multi(Int, pointer(Char), reference(T))',
+        ('multi', ('Int', ('pointer', ('Char',)), ('reference', ('T',))))),
+    ('Func(multi(Int,  String), Bool)',
+        ('Func', (('multi', ('Int', 'String')), 'Bool'))),
+    ('Func(multi(), Void)', ('Func', (('multi', ()), 'Void'))),
+]
+for s, expected in TAGS:
+    parsed = tag.parse_string(s)
+    assert parsed == expected, (s, parsed)
+    assert tag.parse_string(s) is parsed
+    assert tag.parse_string(tag.translate(parsed)) == parsed
+try:
+    tag.parse_string('pointer(Int')
+except tag.ParsingError:
+    pass
+else:
+    assert False, 'unbalanced parens'
+tag.clear_cache()
+print 'OK: tag tokenizer'
+
+# odict
+d = odict([('b', 1), ('a', 2), ('b', 3)])
+assert d.items() == [('b', 3), ('a', 2)]
+d['c'] = 4
+d.setdefault('a', 5)
+assert d.keys() == ['b', 'a', 'c']
+assert d.popitem() == ('b', 3)
+assert d.pop('nope', None) is None
+assert d == {'a': 2, 'c': 4} and d != {'a': 2}
+assert list(d.viewkeys()) == ['a', 'c'] and list(d.viewitems()) == [('a', 2), ('c', 4)]
+assert pickle.loads(pickle.dumps(d, 2)).items() == d.items()
+assert d.copy().items() == d.items()
+# big mappings leave stale entries behind, iteration has to skip them.
+big = odict((i, i) for i in xrange(1000))
+for i in xrange(0, 1000, 3):
+    del big[i]
+big[0] = 'again'
+expected = [i for i in xrange(1000) if i % 3] + [0]
+assert big.keys() == expected and list(big.itervalues())[-1] == 'again'
+for i in expected[:-1]:
+    del big[i]
+assert big.items() == [(0, 'again')]
+print 'OK: odict'